@@ -1,11 +1,15 @@
+import hashlib
+import io
+
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
 from collections import Counter
 
-from src.preprocessing import clean_text
-from src.sentiment_analysis import get_sentiment
-from src.topic_modeling import train_lda
+from src.corpus_cache import clean_text_cached
+from src.deduplication import collapse, expand
+from src.sentiment_analysis import get_sentiment, get_sentiment_batch
+from src.topic_modeling import COHERENCE_OFF, train_lda
 
 
 st.set_page_config(
@@ -70,6 +74,63 @@ def get_top_keywords(text_series, top_n=20):
     return Counter(words).most_common(top_n)
 
 
+# Widget interactions rerun the whole script. Uploads and analysis results
+# are keyed by the file's content hash, so a rerun only looks them up; the
+# DataFrame arguments start with "_" so Streamlit does not hash them again
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_csv(file_hash, _data):
+    return pd.read_csv(io.BytesIO(_data))
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def analyze_dataset(file_hash, text_column, dedup, _df):
+    df = _df.copy()
+
+    # Per-row columns are computed once per exact duplicate and expanded
+    # back, so every row keeps its own label. Near-duplicate groups only
+    # weight topic modeling, where merging similar reviews is harmless
+    exact, _, exact_groups = collapse(df[text_column], near=False)
+    clean = clean_text_cached(exact)
+    sentiment = get_sentiment_batch(exact)
+    df["clean_text"] = expand(clean, exact_groups, df.index)
+    df["sentiment"] = expand(sentiment, exact_groups, df.index)
+
+    if dedup:
+        texts, weights, _ = collapse(df[text_column])
+        clean = df.loc[texts.index, "clean_text"]
+    else:
+        texts, weights, clean = df[text_column], None, df["clean_text"]
+
+    # Topic modeling (internal, UI summary only)
+    # Coherence is not shown in the UI, so skip computing it
+    train_lda(clean, num_topics=5, coherence=COHERENCE_OFF, weights=weights)
+
+    return {
+        "df": df,
+        "groups": len(texts) if dedup else None,
+        "keywords": get_top_keywords(df["clean_text"]),
+    }
+
+
+def uploaded_dataset(uploaded):
+    # Read once per upload; every new upload gets a new file_id. Results of
+    # other files are dropped from the session when the file changes
+    current = st.session_state.get("upload")
+    if current is None or current["file_id"] != uploaded.file_id:
+        data = uploaded.getvalue()
+        file_hash = hashlib.sha256(data).hexdigest()
+        current = {"file_id": uploaded.file_id, "file_hash": file_hash, "df": load_csv(file_hash, data)}
+        st.session_state.upload = current
+        st.session_state.dataset_results = {
+            key: value for key, value in st.session_state.get("dataset_results", {}).items()
+            if key[0] == file_hash
+        }
+    return current["file_hash"], current["df"]
+
+
+results = None  # set by the dataset tab, read by the keyword and dashboard tabs
+
+
 tab1, tab2, tab3, tab4, tab5 = st.tabs([
     "🏠 Overview",
     "📝 Single Text Analysis",
@@ -115,10 +176,11 @@ with tab3:
     st.caption("Upload a CSV file for automated sentiment analysis")
 
     uploaded = st.file_uploader("Upload CSV file", type=["csv"])
+    dedup = st.checkbox("Collapse duplicate and near-duplicate reviews", value=False)
     run = st.button("🚀 Run Analysis")
 
     if uploaded:
-        df = pd.read_csv(uploaded)
+        file_hash, df = uploaded_dataset(uploaded)
 
         if df.select_dtypes(include=["object"]).empty:
             st.error("No text column found in the dataset")
@@ -129,15 +191,28 @@ with tab3:
         st.subheader("📄 Dataset Preview")
         st.dataframe(df.head())
 
-        if run:
+        key = (file_hash, text_column, dedup)
+        stored = st.session_state.setdefault("dataset_results", {})
+        if run and key not in stored:
             with st.spinner("Processing dataset..."):
-                df["clean_text"] = df[text_column].astype(str).apply(clean_text)
-                df["sentiment"] = df[text_column].astype(str).apply(get_sentiment)
+                stored[key] = analyze_dataset(file_hash, text_column, dedup, df)
+        results = stored.get(key)
 
+        if results is not None and st.button("🗑️ Clear results"):
+            # Forget this dataset here and in the cache, so the next run
+            # processes it again
+            del stored[key]
+            analyze_dataset.clear(file_hash, text_column, dedup)
+            st.rerun()
+
+        if results is not None:
             st.success("Analysis completed")
+            if results["groups"] is not None:
+                st.caption(f"{len(results['df'])} reviews collapsed into {results['groups']} duplicate groups")
 
             st.subheader("😊 Sentiment Distribution")
-            sentiment_counts = df["sentiment"].value_counts()
+            sentiment_counts = results["df"]["sentiment"].value_counts()
+            sentiment_counts = sentiment_counts[sentiment_counts > 0]
             sentiment_percent = sentiment_counts / sentiment_counts.sum() * 100
 
             col1, col2 = st.columns(2)
@@ -154,9 +229,6 @@ with tab3:
                 ax.axis("equal")
                 st.pyplot(fig)
 
-            # Topic modeling (internal, UI summary only)
-            train_lda(df["clean_text"], num_topics=5)
-
             st.subheader("🧠 Topic Modeling Insights")
             st.markdown("""
             Topic modeling was applied internally to identify recurring themes.
@@ -175,9 +247,8 @@ with tab4:
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.subheader("🔑 Keyword Insights")
 
-    if "df" in locals() and "clean_text" in df.columns:
-        keywords = get_top_keywords(df["clean_text"])
-        kw_df = pd.DataFrame(keywords, columns=["Keyword", "Frequency"])
+    if results is not None:
+        kw_df = pd.DataFrame(results["keywords"], columns=["Keyword", "Frequency"])
 
         colA, colB = st.columns(2)
         with colA:
@@ -191,7 +262,8 @@ with tab4:
 
 
 with tab5:
-    if "df" in locals() and "sentiment" in df.columns:
+    if results is not None:
+        df = results["df"]
 
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.subheader("📊 Summary Dashboard")
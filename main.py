@@ -1,19 +1,163 @@
+import argparse
+import os
+
+import pandas as pd
+
 from src.input_handling import load_csv
-from src.preprocessing import clean_text
-from src.topic_modeling import train_lda
-from src.summarization import extractive_summary
+from src.corpus_cache import clean_text_cached
+from src.deduplication import collapse, expand
+from src.sentiment_analysis import SENTIMENT_LABELS, get_sentiment_batch
+from src.topic_modeling import (
+    COHERENCE_C_V, COHERENCE_METRICS, sweep_num_topics, train_lda, update_lda
+)
+from src.summarization import StreamingSummarizer, extractive_summary
+
+DATA_PATH = "data/raw/amazon_reviews_labeled.csv"
+OUTPUT_PATH = "data/processed/reviews_scored.csv"
+TEXT_COLUMN = "review"
+NUM_TOPICS = 5
+
+
+def run_in_memory(path, num_topics=NUM_TOPICS, workers=None, coherence=COHERENCE_C_V,
+                  coherence_sample=None, dedup=False):
+    df = load_csv(path)
+
+    # Per-row columns are computed once per exact duplicate and expanded
+    # back to the original rows. With dedup, topic modeling and the summary
+    # run once per near-duplicate group, weighted by group size
+    exact, _, exact_groups = collapse(df[TEXT_COLUMN], near=False)
+    clean = clean_text_cached(exact)
+    sentiment = get_sentiment_batch(exact)
+    df["clean_text"] = expand(clean, exact_groups, df.index)
+    df["predicted_sentiment"] = expand(sentiment, exact_groups, df.index)
+
+    if dedup:
+        texts, weights, _ = collapse(df[TEXT_COLUMN])
+        clean = df.loc[texts.index, "clean_text"]
+        print(f"Collapsed {len(df)} reviews into {len(texts)} duplicate groups\n")
+    else:
+        texts, weights, clean = df[TEXT_COLUMN], None, df["clean_text"]
+
+    print("Sentiment Distribution:")
+    print(df["predicted_sentiment"].value_counts())
+    print()
+
+    lda, topics, coherence = train_lda(
+        clean,
+        num_topics=num_topics,
+        workers=workers,
+        coherence=coherence,
+        coherence_sample=coherence_sample,
+        weights=weights
+    )
+
+    print("Topics:")
+    for t in topics:
+        print(t)
+
+    if coherence is not None:
+        print("\nCoherence Score:", coherence)
+
+    summary = extractive_summary(texts, weights=weights)
+    print("\nSummary:")
+    print(summary)
+
+
+def run_sweep(path, workers=None):
+    # Ranks candidate topic counts by u_mass coherence
+    df = load_csv(path, usecols=[TEXT_COLUMN])
+    clean = clean_text_cached(df[TEXT_COLUMN])
+
+    results = sweep_num_topics(clean, max_workers=workers)
+    print("Topic count sweep:")
+    print(results.to_string(index=False))
+
+
+def run_update(path, coherence=COHERENCE_C_V, coherence_sample=None):
+    # Folds a batch of new reviews into the latest stored topic model
+    df = load_csv(path, usecols=[TEXT_COLUMN])
+    clean = clean_text_cached(df[TEXT_COLUMN])
+
+    lda, topics, coherence, key = update_lda(clean, coherence=coherence, coherence_sample=coherence_sample)
+
+    print(f"Updated topic model with {len(df)} reviews -> version {key[:12]}")
+    print("Topics:")
+    for t in topics:
+        print(t)
+
+    if coherence is not None:
+        print("\nCoherence Score (new batch):", coherence)
+
+
+def run_streaming(path, output_path, chunksize):
+    # Only one chunk is held in memory at a time; scored rows are appended
+    # to output_path as they are produced
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    counts = pd.Series(0, index=SENTIMENT_LABELS)
+    summarizer = StreamingSummarizer()
+    rows = 0
+
+    for i, chunk in enumerate(load_csv(path, chunksize=chunksize, usecols=[TEXT_COLUMN])):
+        chunk["clean_text"] = clean_text_cached(chunk[TEXT_COLUMN])
+        chunk["predicted_sentiment"] = get_sentiment_batch(chunk[TEXT_COLUMN])
+        chunk.to_csv(output_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+
+        counts += chunk["predicted_sentiment"].value_counts().reindex(SENTIMENT_LABELS, fill_value=0)
+        summarizer.add(chunk[TEXT_COLUMN])
+        rows += len(chunk)
 
-df = load_csv("data/raw/amazon_reviews_labeled.csv")
-df["clean_text"] = df["review"].apply(clean_text)
+    print(f"Scored {rows} rows -> {output_path}")
+    print("Sentiment Distribution:")
+    print(counts)
 
-lda, topics, coherence = train_lda(df["clean_text"])
+    print("\nSummary:")
+    print(summarizer.summary())
 
-print("Topics:")
-for t in topics:
-    print(t)
 
-print("\nCoherence Score:", coherence)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ReviewScope batch analysis")
+    parser.add_argument("--input", default=DATA_PATH)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument(
+        "--chunksize", type=int, default=None,
+        help="Stream the CSV in chunks of this many rows (cleaning, sentiment and summary)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Worker processes for LdaMulticore training, or the pool size with --sweep"
+    )
+    parser.add_argument("--num-topics", type=int, default=NUM_TOPICS)
+    parser.add_argument(
+        "--dedup", action="store_true",
+        help="Analyse exact and near-duplicate reviews once per group, weighted by group size"
+    )
+    parser.add_argument(
+        "--sweep", action="store_true",
+        help="Rank candidate topic counts by coherence instead of training one model"
+    )
+    parser.add_argument(
+        "--update", action="store_true",
+        help="Update the latest stored topic model with the reviews in --input instead of retraining"
+    )
+    parser.add_argument("--coherence", choices=COHERENCE_METRICS, default=COHERENCE_C_V)
+    parser.add_argument(
+        "--coherence-sample", type=int, default=None,
+        help="Compute c_v coherence on a random sample of this many documents"
+    )
+    args = parser.parse_args()
 
-summary = extractive_summary(df["review"])
-print("\nSummary:")
-print(summary)
+    if args.sweep:
+        run_sweep(args.input, workers=args.workers)
+    elif args.update:
+        run_update(args.input, coherence=args.coherence, coherence_sample=args.coherence_sample)
+    elif args.chunksize:
+        run_streaming(args.input, args.output, args.chunksize)
+    else:
+        run_in_memory(
+            args.input,
+            num_topics=args.num_topics,
+            workers=args.workers,
+            coherence=args.coherence,
+            coherence_sample=args.coherence_sample,
+            dedup=args.dedup
+        )
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+from src.input_handling import PYARROW_AVAILABLE
+from src.preprocessing import clean_text_batch, preprocessing_config
+
+CACHE_DIR = os.path.join("data", "cache", "preprocessed")
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def cache_stats():
+    total = _stats["hits"] + _stats["misses"]
+    return {**_stats, "hit_rate": _stats["hits"] / total if total else 0.0}
+
+
+def corpus_key(texts):
+    # Content address: the raw text values (in order) plus the cleaning config.
+    # Values are hashed as-is; clean_text stringifies them, so this can only
+    # be stricter than necessary, never looser
+    texts = pd.Series(texts)
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(texts, index=False).to_numpy().tobytes())
+    digest.update(json.dumps(preprocessing_config(), sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def _evict(cache_dir, max_bytes):
+    # Least recently used first; hits refresh a file's mtime
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(".parquet"):
+            path = os.path.join(cache_dir, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        _stats["evictions"] += 1
+
+
+def clean_text_cached(texts, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    texts = pd.Series(texts)
+    if not PYARROW_AVAILABLE:
+        return clean_text_batch(texts)
+
+    key = corpus_key(texts)
+    path = os.path.join(cache_dir, f"{key}.parquet")
+
+    try:
+        cleaned = pd.read_parquet(path)["clean_text"]
+        os.utime(path)
+        _stats["hits"] += 1
+        return pd.Series(cleaned.to_numpy(), index=texts.index, name=texts.name)
+    except (FileNotFoundError, OSError, KeyError):
+        pass
+
+    _stats["misses"] += 1
+    cleaned = clean_text_batch(texts)
+
+    # Write to a temp file and rename, so concurrent readers never see a
+    # partially written entry
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    os.close(fd)
+    try:
+        pd.DataFrame({"clean_text": cleaned.to_numpy()}).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    _evict(cache_dir, max_bytes)
+    return cleaned
@@ -0,0 +1,140 @@
+import re
+import zlib
+
+import numpy as np
+import pandas as pd
+
+NUM_PERM = 128
+BANDS = 32
+SHINGLE_SIZE = 5
+SIMILARITY_THRESHOLD = 0.8
+BATCH_BYTES = 64 * 1024 * 1024  # hashed shingles held at once by minhash_signatures
+
+def normalize(text):
+    return " ".join(re.sub(r"[^a-z0-9\s]", " ", str(text).lower()).split())
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    # Character n-grams, hashed to 32 bits; short texts become one shingle
+    if len(text) <= size:
+        return {zlib.crc32(text.encode())}
+    return {zlib.crc32(text[i:i + size].encode()) for i in range(len(text) - size + 1)}
+
+
+def _shingle_batches(texts, shingle_size, max_shingles):
+    # Consecutive documents, grouped so each batch holds at most max_shingles
+    # shingles (a single longer document forms its own batch)
+    batch, total = [], 0
+    for text in texts:
+        sh = shingles(text, shingle_size)
+        if batch and total + len(sh) > max_shingles:
+            yield batch
+            batch, total = [], 0
+        batch.append(sh)
+        total += len(sh)
+    if batch:
+        yield batch
+
+
+def minhash_signatures(texts, num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE, seed=42,
+                       max_bytes=BATCH_BYTES):
+    # (len(texts), num_perm) matrix of MinHash values. Each permutation is
+    # x -> a * x + b mod 2**32 with odd a (a bijection on 32-bit shingle
+    # hashes), which numpy evaluates with plain wrapping uint32 arithmetic.
+    # The (permutations, shingles) matrix of a batch stays within max_bytes:
+    # batches are sized by shingle count, and a batch too large for every
+    # permutation at once (one very long text) takes them in blocks.
+    rng = np.random.RandomState(seed)
+    a = (rng.randint(0, 1 << 31, size=num_perm).astype(np.uint32) << np.uint32(1)) | np.uint32(1)
+    b = rng.randint(0, 1 << 31, size=num_perm).astype(np.uint32)
+    max_values = max(1, max_bytes // np.dtype(np.uint32).itemsize)
+
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    start = 0
+    for batch in _shingle_batches(texts, shingle_size, max(1, max_values // num_perm)):
+        # Hash every shingle of the batch at once, then take the
+        # per-document minimum over contiguous row ranges
+        offsets = np.cumsum([0] + [len(sh) for sh in batch[:-1]])
+        hashed = np.fromiter((h for sh in batch for h in sh), dtype=np.uint32)
+        step = max(1, max_values // len(hashed))
+        for p in range(0, num_perm, step):
+            # (num_perm, shingles) layout keeps each reduction contiguous;
+            # built in place so there is no second temporary of this size
+            values = np.multiply(a[p:p + step, None], hashed)
+            values += b[p:p + step, None]
+            signatures[start:start + len(batch), p:p + step] = np.minimum.reduceat(values, offsets, axis=1).T
+        start += len(batch)
+    return signatures
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def find_groups(texts, threshold=SIMILARITY_THRESHOLD, num_perm=NUM_PERM, bands=BANDS,
+                shingle_size=SHINGLE_SIZE, near=True):
+    # Group id per row (0..n_groups-1, in order of first appearance).
+    # Exact duplicates (after normalisation) are grouped by hashing; with
+    # near=True, distinct texts whose estimated Jaccard similarity is at
+    # least `threshold` are merged using LSH banding over MinHash signatures.
+    texts = pd.Series(texts)
+    codes, uniques = pd.factorize(texts.map(normalize))
+    if not near or len(uniques) < 2:
+        return codes
+
+    if num_perm % bands:
+        raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+    rows = num_perm // bands
+    signatures = minhash_signatures(uniques, num_perm, shingle_size)
+    mixer = np.random.RandomState(0).randint(1, 1 << 62, size=rows).astype(np.uint64) | np.uint64(1)
+
+    # Every member of a band bucket is a candidate pair with the bucket's
+    # first member; pairs found in several bands are verified only once
+    candidates = []
+    for band in range(bands):
+        block = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64)
+        keys = (block * mixer).sum(axis=1)
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        j = first[inverse]
+        i = np.flatnonzero(j != np.arange(len(keys)))
+        candidates.append(np.column_stack([j[i], i]))
+    pairs = np.unique(np.concatenate(candidates), axis=0)
+
+    # Verify candidates on the full signature before merging
+    i, j = pairs[:, 0], pairs[:, 1]
+    similar = (signatures[i] == signatures[j]).mean(axis=1) >= threshold
+
+    parent = np.arange(len(uniques))
+    for x, y in zip(i[similar], j[similar]):
+        rx, ry = _find(parent, x), _find(parent, y)
+        if rx != ry:
+            parent[max(rx, ry)] = min(rx, ry)
+
+    roots = np.array([_find(parent, i) for i in range(len(uniques))])
+    group_of_unique = pd.factorize(roots)[0]
+    return group_of_unique[codes]
+
+
+def collapse(texts, **kwargs):
+    # Returns (representatives, weights, groups): the first row of every
+    # group (original index kept), each group's size, and the group id per
+    # input row for expand()
+    texts = pd.Series(texts)
+    groups = find_groups(texts, **kwargs)
+    _, first = np.unique(groups, return_index=True)
+    weights = np.bincount(groups)
+    return texts.iloc[first], weights, groups
+
+
+def expand(values, groups, index=None, name=None):
+    # Broadcast one value per group back to the original rows
+    values = pd.Series(values)
+    return pd.Series(
+        values.to_numpy()[groups] if not isinstance(values.dtype, pd.CategoricalDtype)
+        else pd.Categorical.from_codes(values.cat.codes.to_numpy()[groups], dtype=values.dtype),
+        index=index,
+        name=name if name is not None else values.name
+    )
@@ -1,4 +1,16 @@
+import importlib.util
+
 import pandas as pd
 
-def load_csv(path):
-    return pd.read_csv(path)
+# pandas' pyarrow engine is multithreaded but cannot stream, so it is only
+# used for whole-file reads
+PYARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+
+def load_csv(path, chunksize=None, usecols=None):
+    if chunksize:
+        # Iterator of DataFrames of at most `chunksize` rows
+        return pd.read_csv(path, chunksize=chunksize, usecols=usecols)
+
+    engine = "pyarrow" if PYARROW_AVAILABLE else None
+    return pd.read_csv(path, usecols=usecols, engine=engine)
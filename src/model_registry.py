@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from gensim import corpora
+from gensim.models import LdaModel
+
+REGISTRY_DIR = os.path.join("models", "registry")
+REGISTRY_MAX_VERSIONS = 10
+LATEST_FILE = "LATEST"
+
+# Artifacts written directly to models/ before the registry existed
+LEGACY_MODEL_PATH = os.path.join("models", "lda_model.model")
+LEGACY_DICTIONARY_PATH = os.path.join("models", "lda_dictionary.dict")
+LEGACY_KEY = "legacy"
+
+MODEL_FILE = "lda.model"
+DICTIONARY_FILE = "dictionary.dict"
+META_FILE = "meta.json"
+
+
+def fingerprint(texts, params, weights=None):
+    # Content address for a trained model: the training texts (in order),
+    # their weights if any, plus every hyperparameter that changes the result
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(pd.Series(texts), index=False).to_numpy().tobytes())
+    if weights is not None:
+        digest.update(np.asarray(weights, dtype=np.int64).tobytes())
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def _version_dir(key, registry_dir):
+    return os.path.join(registry_dir, key)
+
+
+def lookup(key, registry_dir=REGISTRY_DIR):
+    # Returns (lda, dictionary, meta) for a registered version, else None
+    version_dir = _version_dir(key, registry_dir)
+    meta_path = os.path.join(version_dir, META_FILE)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        lda = LdaModel.load(os.path.join(version_dir, MODEL_FILE))
+        dictionary = corpora.Dictionary.load(os.path.join(version_dir, DICTIONARY_FILE))
+        os.utime(meta_path)
+    except (FileNotFoundError, OSError, ValueError):
+        # Missing, or evicted while being read
+        return None
+
+    return lda, dictionary, meta
+
+
+def load_latest(registry_dir=REGISTRY_DIR):
+    # (lda, dictionary, key) of the newest version, falling back to the
+    # legacy models/ artifacts when nothing has been registered yet
+    key = latest_key(registry_dir)
+    cached = lookup(key, registry_dir) if key else None
+    if cached is not None:
+        lda, dictionary, _ = cached
+        return lda, dictionary, key
+
+    if os.path.exists(LEGACY_MODEL_PATH) and os.path.exists(LEGACY_DICTIONARY_PATH):
+        return LdaModel.load(LEGACY_MODEL_PATH), corpora.Dictionary.load(LEGACY_DICTIONARY_PATH), LEGACY_KEY
+
+    raise FileNotFoundError(f"No LDA model in {registry_dir} or {LEGACY_MODEL_PATH}")
+
+
+def update_meta(key, update, registry_dir=REGISTRY_DIR):
+    # Applies update(meta) in place and rewrites meta.json atomically;
+    # a no-op if the version has been evicted meanwhile
+    version_dir = _version_dir(key, registry_dir)
+    meta_path = os.path.join(version_dir, META_FILE)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    update(meta)
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=version_dir, prefix=".tmp-")
+    except FileNotFoundError:
+        return None
+    with os.fdopen(fd, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, meta_path)
+    return meta
+
+
+def register(key, lda, dictionary, meta, registry_dir=REGISTRY_DIR, max_versions=REGISTRY_MAX_VERSIONS):
+    # Each version is written to a private temp dir and renamed into place,
+    # so concurrent sessions never overwrite each other's files
+    os.makedirs(registry_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=registry_dir, prefix=".tmp-")
+    try:
+        lda.save(os.path.join(tmp_dir, MODEL_FILE))
+        dictionary.save(os.path.join(tmp_dir, DICTIONARY_FILE))
+        with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+            json.dump({**meta, "key": key, "created": time.time()}, f, indent=2)
+        os.rename(tmp_dir, _version_dir(key, registry_dir))
+    except OSError:
+        # Another session published the same fingerprint first; keep theirs
+        if not os.path.isdir(_version_dir(key, registry_dir)):
+            raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    _set_latest(key, registry_dir)
+    evict(registry_dir, max_versions)
+    return _version_dir(key, registry_dir)
+
+
+def _set_latest(key, registry_dir):
+    fd, tmp_path = tempfile.mkstemp(dir=registry_dir, prefix=".tmp-")
+    with os.fdopen(fd, "w") as f:
+        f.write(key)
+    os.replace(tmp_path, os.path.join(registry_dir, LATEST_FILE))
+
+
+def latest_key(registry_dir=REGISTRY_DIR):
+    try:
+        with open(os.path.join(registry_dir, LATEST_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    # [(last_used, key)] oldest first
+    versions = []
+    if not os.path.isdir(registry_dir):
+        return versions
+    for name in os.listdir(registry_dir):
+        meta_path = os.path.join(registry_dir, name, META_FILE)
+        if not name.startswith(".") and os.path.exists(meta_path):
+            versions.append((os.stat(meta_path).st_mtime, name))
+    return sorted(versions)
+
+
+def evict(registry_dir=REGISTRY_DIR, max_versions=REGISTRY_MAX_VERSIONS):
+    # Drop least recently used versions past the budget, never the latest
+    latest = latest_key(registry_dir)
+    versions = [key for _, key in list_versions(registry_dir) if key != latest]
+    excess = len(versions) + (latest is not None) - max_versions
+    for key in versions[:max(0, excess)]:
+        shutil.rmtree(_version_dir(key, registry_dir), ignore_errors=True)
@@ -1,17 +1,112 @@
+import os
 import re
-import nltk
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
+from functools import lru_cache
 
-nltk.download("stopwords")
-nltk.download("wordnet")
+import pandas as pd
+
+LEMMA_CACHE_SIZE = 100_000
+# Bump whenever clean_text's output changes, so cached corpora are invalidated
+CLEANING_VERSION = 1
+
+# Project-local NLTK data, searched before NLTK's default locations.
+# Populate it once with:
+#   python -m nltk.downloader -d nltk_data stopwords wordnet
+NLTK_DATA_DIR = os.environ.get(
+    "REVIEWSCOPE_NLTK_DATA",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nltk_data")
+)
+NLTK_RESOURCES = {
+    "stopwords": "corpora/stopwords",
+    "wordnet": "corpora/wordnet",
+}
+
+stop_words = None
+lemmatizer = None
+
+
+def load_resources():
+    # Loads stopwords and WordNet on first use, from local data only
+    global stop_words, lemmatizer
+    if stop_words is not None and lemmatizer is not None:
+        return
+
+    import nltk
+
+    if NLTK_DATA_DIR not in nltk.data.path:
+        nltk.data.path.insert(0, NLTK_DATA_DIR)
+
+    missing = []
+    for name, resource in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            missing.append(name)
+    if missing:
+        raise RuntimeError(
+            f"Missing NLTK data: {', '.join(missing)}. Searched {NLTK_DATA_DIR} "
+            f"and NLTK's default paths. Install it with: "
+            f"python -m nltk.downloader -d {NLTK_DATA_DIR} {' '.join(missing)}"
+        )
+
+    from nltk.corpus import stopwords, wordnet
+    from nltk.stem import WordNetLemmatizer
+
+    wordnet.ensure_loaded()
+    stop_words = set(stopwords.words("english"))
+    lemmatizer = WordNetLemmatizer()
+
+
+def preprocessing_config():
+    # Everything that determines clean_text's output, for cache keys
+    load_resources()
+    return {
+        "version": CLEANING_VERSION,
+        "stop_words": sorted(stop_words),
+        "lemmatizer": type(lemmatizer).__name__,
+    }
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemmatize(word):
+    return lemmatizer.lemmatize(word)
+
+
+def lemma_cache_info():
+    # (hits, misses, maxsize, currsize) of the shared lemma memo
+    return lemmatize.cache_info()
 
-stop_words = set(stopwords.words("english"))
-lemmatizer = WordNetLemmatizer()
 
 def clean_text(text):
+    load_resources()
     text = str(text).lower()
     text = re.sub(r"[^a-z\s]", "", text)
     words = text.split()
-    words = [lemmatizer.lemmatize(w) for w in words if w not in stop_words]
+    words = [lemmatize(w) for w in words if w not in stop_words]
     return " ".join(words)
+
+
+def clean_text_batch(texts):
+    load_resources()
+    texts = pd.Series(texts)
+
+    # Clean each distinct document once
+    codes, uniques = pd.factorize(texts.map(str))
+    normalized = (
+        pd.Series(uniques, dtype=object)
+        .str.lower()
+        .str.replace(r"[^a-z\s]", "", regex=True)
+        .str.split()
+    )
+
+    vocabulary = {w for words in normalized for w in words} - stop_words
+    lemmas = {w: lemmatize(w) for w in vocabulary}
+
+    cleaned = [
+        " ".join(lemmas[w] for w in words if w in lemmas)
+        for words in normalized
+    ]
+    return pd.Series(
+        pd.Series(cleaned, dtype=object).to_numpy()[codes],
+        index=texts.index,
+        name=texts.name
+    )
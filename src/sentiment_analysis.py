@@ -1,3 +1,9 @@
+import re
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
 positive_words = {
     "good", "great", "excellent", "amazing", "awesome", "fantastic",
     "love", "loved", "lovely", "nice", "perfect", "best", "wonderful",
@@ -19,11 +25,95 @@ negative_words = {
     "unreliable", "rude", "late", "missing", "incomplete"
 }
 
-def get_sentiment(text):
-    text = str(text).lower()
+SUBSTRING = "substring"
+WHOLE_WORD = "word"
+
+
+def _trie_pattern(words):
+    # Nest the lexicon as a character trie so the regex engine shares common
+    # prefixes instead of retrying ~80 alternatives at every position.
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def emit(node):
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Greedy optional tail, so the longest word at a position wins
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+
+def _compile_lexicon(positive, negative):
+    lexicon = positive | negative
+    alternation = _trie_pattern(lexicon)
+    # Every shorter lexicon word starting at a hit position is a prefix of the hit
+    prefixes = {w: [p for p in lexicon if w.startswith(p)] for w in lexicon}
+    patterns = {
+        # Zero-width lookahead so overlapping hits ("love" in "loved") are kept
+        SUBSTRING: re.compile(f"(?=({alternation}))"),
+        WHOLE_WORD: re.compile(rf"\b({alternation})\b"),
+    }
+    return patterns, prefixes
+
+
+_patterns, _prefixes = _compile_lexicon(positive_words, negative_words)
+
+
+SENTIMENT_LABELS = ["Positive", "Negative", "Neutral"]
+
+_vocabulary = sorted(positive_words | negative_words)
+_vocabulary_index = {w: i for i, w in enumerate(_vocabulary)}
+# (vocabulary x 2) weights: column 0 counts positive hits, column 1 negative
+_polarity = np.array(
+    [[w in positive_words, w in negative_words] for w in _vocabulary],
+    dtype=np.int32
+)
 
-    pos_score = sum(word in text for word in positive_words)
-    neg_score = sum(word in text for word in negative_words)
+
+def _lexicon_terms(text, mode=SUBSTRING):
+    if mode not in _patterns:
+        raise ValueError(f"Unknown match mode: {mode}. Allowed: {SUBSTRING}, {WHOLE_WORD}")
+
+    hits = set()
+    for match in _patterns[mode].finditer(str(text).lower()):
+        word = match.group(1)
+        hits.update(_prefixes[word] if mode == SUBSTRING else (word,))
+    return hits
+
+
+def _lexicon_dtm(texts, mode=SUBSTRING):
+    # Binary document-term matrix over the fixed lexicon vocabulary, assembled
+    # straight into CSR (what CountVectorizer(vocabulary=..., binary=True)
+    # would build, minus its per-document overhead)
+    indices = []
+    indptr = [0]
+    for text in texts:
+        indices.extend(_vocabulary_index[w] for w in _lexicon_terms(text, mode))
+        indptr.append(len(indices))
+
+    data = np.ones(len(indices), dtype=np.int32)
+    return sparse.csr_matrix(
+        (data, indices, indptr),
+        shape=(len(indptr) - 1, len(_vocabulary))
+    )
+
+
+def lexicon_hits(text, mode=SUBSTRING):
+    hits = _lexicon_terms(text, mode)
+    pos_score = len(hits & positive_words)
+    neg_score = len(hits & negative_words)
+    return pos_score, neg_score
+
+
+def get_sentiment(text, mode=SUBSTRING):
+    pos_score, neg_score = lexicon_hits(text, mode)
 
     if pos_score > neg_score:
         return "Positive"
@@ -32,3 +122,26 @@ def get_sentiment(text):
     else:
         return "Neutral"
 
+
+def get_sentiment_batch(texts, mode=SUBSTRING):
+    if mode not in _patterns:
+        raise ValueError(f"Unknown match mode: {mode}. Allowed: {SUBSTRING}, {WHOLE_WORD}")
+    texts = pd.Series(texts)
+
+    # Review dumps repeat heavily, so only distinct texts are scored
+    codes, uniques = pd.factorize(texts.fillna("").astype(str))
+
+    dtm = _lexicon_dtm(uniques, mode)
+
+    scores = np.asarray(dtm @ _polarity)
+    pos_score, neg_score = scores[:, 0], scores[:, 1]
+    labels = np.select(
+        [pos_score > neg_score, neg_score > pos_score],
+        [0, 1],
+        default=2
+    )
+    return pd.Series(
+        pd.Categorical.from_codes(labels[codes], categories=SENTIMENT_LABELS),
+        index=texts.index,
+        name="sentiment"
+    )
@@ -1,7 +1,102 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import HashingVectorizer
+from scipy import sparse
 import numpy as np
+import pandas as pd
 
-def extractive_summary(texts, n=5):
-    tfidf = TfidfVectorizer(stop_words="english").fit_transform(texts)
-    scores = np.array(tfidf.sum(axis=1)).flatten()
-    return texts.iloc[scores.argsort()[-n:]]
+N_FEATURES = 2 ** 18
+CHUNK_SIZE = 10_000
+
+
+def top_k(scores, k):
+    # Indices of the k largest scores, best first, without a full sort
+    if len(scores) > k:
+        idx = np.argpartition(-scores, k)[:k]
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+class StreamingSummarizer:
+    # Centroid-based extractive summary over texts that arrive in chunks.
+    # Memory is bounded by the hashed feature space plus a small candidate
+    # pool, not by the corpus or its vocabulary.
+    def __init__(self, n=5, n_features=N_FEATURES, pool_size=None, diversity=0.3):
+        self.n = n
+        self.diversity = diversity
+        self.pool_size = pool_size or 20 * n
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
+            stop_words="english",
+            alternate_sign=False,
+            norm="l2"
+        )
+        self.centroid = np.zeros(n_features)
+        self.pool_vectors = None
+        self.pool_texts = pd.Series(dtype=object)
+
+    def _relevance(self, vectors):
+        # Cosine similarity to the corpus centroid; rows are already unit
+        # length, so long reviews are not favoured
+        norm = np.linalg.norm(self.centroid)
+        if not norm:
+            return np.zeros(vectors.shape[0])
+        return np.asarray(vectors @ (self.centroid / norm)).ravel()
+
+    def add(self, texts, weights=None):
+        # weights (e.g. duplicate group sizes) scale each text's pull on the
+        # centroid, as if it appeared that many times
+        texts = pd.Series(texts)
+        weights = np.ones(len(texts)) if weights is None else np.asarray(weights, dtype=float)
+        present = texts.notna().to_numpy()
+        texts, weights = texts[present].astype(str), weights[present]
+        if texts.empty:
+            return self
+
+        vectors = self.vectorizer.transform(texts)
+        self.centroid += np.asarray(vectors.T @ weights).ravel()
+
+        if self.pool_vectors is None:
+            pool_vectors, pool_texts = vectors, texts
+        else:
+            pool_vectors = sparse.vstack([self.pool_vectors, vectors], format="csr")
+            pool_texts = pd.concat([self.pool_texts, texts])
+
+        # Exact copies can never both be selected, so keep one per text
+        unique = np.flatnonzero(~pool_texts.duplicated().to_numpy())
+        keep = unique[top_k(self._relevance(pool_vectors[unique]), self.pool_size)]
+        self.pool_vectors = pool_vectors[keep]
+        self.pool_texts = pool_texts.iloc[keep]
+        return self
+
+    def summary(self, n=None):
+        # Maximal marginal relevance: trade centroid relevance against
+        # similarity to the reviews already selected
+        n = self.n if n is None else n
+        if self.pool_vectors is None:
+            return self.pool_texts
+
+        relevance = self._relevance(self.pool_vectors)
+        redundancy = np.zeros(len(relevance))
+        available = np.ones(len(relevance), dtype=bool)
+        selected = []
+
+        for _ in range(min(n, len(relevance))):
+            mmr = (1 - self.diversity) * relevance - self.diversity * redundancy
+            mmr[~available] = -np.inf
+            best = int(np.argmax(mmr))
+            selected.append(best)
+            available[best] = False
+
+            similarity = (self.pool_vectors @ self.pool_vectors[best].T).toarray().ravel()
+            redundancy = np.maximum(redundancy, similarity)
+
+        return self.pool_texts.iloc[selected]
+
+
+def extractive_summary(texts, n=5, chunk_size=CHUNK_SIZE, weights=None, **kwargs):
+    summarizer = StreamingSummarizer(n=n, **kwargs)
+    texts = pd.Series(texts)
+    for start in range(0, len(texts), chunk_size):
+        end = start + chunk_size
+        summarizer.add(texts.iloc[start:end], None if weights is None else weights[start:end])
+    return summarizer.summary()
@@ -1,30 +1,397 @@
+import os
+import random
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
 from gensim import corpora
-from gensim.models import LdaModel
+from gensim.models import LdaModel, LdaMulticore
 from gensim.models.coherencemodel import CoherenceModel
 
-def train_lda(texts, num_topics=5):
-    tokens = [t.split() for t in texts if t.strip()]
-    dictionary = corpora.Dictionary(tokens)
-    corpus = [dictionary.doc2bow(t) for t in tokens]
+from src import model_registry
+
+COHERENCE_OFF = "off"
+COHERENCE_U_MASS = "u_mass"
+COHERENCE_C_V = "c_v"
+COHERENCE_METRICS = (COHERENCE_OFF, COHERENCE_U_MASS, COHERENCE_C_V)
+
+MAX_VOCABULARY = 100_000
+
+_background = None
+
+
+class TokenStream:
+    # Re-iterable token lists for gensim, without materialising the corpus.
+    # Optional per-text weights (e.g. duplicate group sizes) stay aligned
+    # with the non-blank texts through weighted().
+    def __init__(self, texts, weights=None):
+        self.texts = texts
+        self.weights = weights
+
+    def __iter__(self):
+        for t in self.texts:
+            if t.strip():
+                yield t.split()
+
+    def weighted(self):
+        weights = self.weights if self.weights is not None else (1 for _ in self.texts)
+        for t, w in zip(self.texts, weights):
+            if t.strip():
+                yield t.split(), w
+
+
+class BowStream:
+    # Re-iterable bag-of-words vectors built on the fly from a TokenStream
+    def __init__(self, tokens, dictionary):
+        self.tokens = tokens
+        self.dictionary = dictionary
+
+    def __iter__(self):
+        for t in self.tokens:
+            yield self.dictionary.doc2bow(t)
+
+
+class CoherenceScore(float):
+    # A plain float score that also records what it was computed on
+    def __new__(cls, score, metric, sample_size, total_docs):
+        obj = super().__new__(cls, score)
+        obj.metric = metric
+        obj.sample_size = sample_size
+        obj.total_docs = total_docs
+        return obj
+
+    def __repr__(self):
+        return f"{float(self):.4f} ({self.metric} on {self.sample_size}/{self.total_docs} docs)"
+
+    def to_dict(self):
+        return {
+            "score": float(self),
+            "sample_size": self.sample_size,
+            "total_docs": self.total_docs,
+        }
+
+
+def serialize_corpus(tokens, dictionary, path):
+    # Stream bag-of-words vectors to a Matrix Market file and reopen it
+    # lazily, so training passes read documents from disk. Weighted texts
+    # have their term counts scaled, standing in for that many copies.
+    corpora.MmCorpus.serialize(path, (
+        [(tid, count * w) for tid, count in dictionary.doc2bow(t)]
+        for t, w in tokens.weighted()
+    ))
+    return corpora.MmCorpus(path)
+
+
+def sample_tokens(tokens, sample_size, random_state=42):
+    # Reservoir sample of token lists in a single pass
+    rng = random.Random(random_state)
+    sample = []
+    for n, doc in enumerate(tokens):
+        if len(sample) < sample_size:
+            sample.append(doc)
+        else:
+            j = rng.randrange(n + 1)
+            if j < sample_size:
+                sample[j] = doc
+    return sample
+
+
+def compute_coherence(lda, tokens, dictionary, corpus=None, metric=COHERENCE_C_V,
+                      sample_size=None, processes=-1, random_state=42, total_docs=None):
+    if metric not in COHERENCE_METRICS:
+        raise ValueError(f"Unknown coherence metric: {metric}. Allowed: {COHERENCE_METRICS}")
+    if metric == COHERENCE_OFF:
+        return None
+
+    if total_docs is None:
+        total_docs = dictionary.num_docs
+
+    if metric == COHERENCE_U_MASS:
+        # Document co-occurrence counts straight from the bag-of-words corpus
+        coherence_model = CoherenceModel(
+            model=lda,
+            corpus=corpus if corpus is not None else BowStream(tokens, dictionary),
+            dictionary=dictionary,
+            coherence=COHERENCE_U_MASS
+        )
+        return CoherenceScore(coherence_model.get_coherence(), metric, total_docs, total_docs)
+
+    # c_v needs sliding-window statistics over the texts, so it runs on a
+    # sample when one is requested, spread over `processes` workers
+    if sample_size and sample_size < total_docs:
+        texts = sample_tokens(tokens, sample_size, random_state)
+    else:
+        texts = tokens
+    coherence_model = CoherenceModel(
+        model=lda,
+        texts=texts,
+        dictionary=dictionary,
+        coherence=COHERENCE_C_V,
+        processes=processes
+    )
+    used = len(texts) if isinstance(texts, list) else total_docs
+    return CoherenceScore(coherence_model.get_coherence(), metric, used, total_docs)
+
+
+def _coherence_id(metric, sample_size):
+    return f"{metric}@{sample_size}" if metric == COHERENCE_C_V and sample_size else metric
+
+
+def _coherence_stage(lda, tokens, dictionary, corpus, metric, sample_size,
+                     processes, random_state, key, total_docs=None):
+    score = compute_coherence(
+        lda, tokens, dictionary, corpus, metric,
+        sample_size=sample_size,
+        processes=processes,
+        random_state=random_state,
+        total_docs=total_docs
+    )
+    if key is not None and score is not None:
+        coherence_id = _coherence_id(metric, sample_size)
+
+        def record(meta):
+            # Older registry versions stored a single float here
+            if not isinstance(meta.get("coherence"), dict):
+                meta["coherence"] = {}
+            meta["coherence"][coherence_id] = score.to_dict()
+
+        model_registry.update_meta(key, record)
+    return score
+
 
+def _submit_background(fn):
+    global _background
+    if _background is None:
+        _background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="coherence")
+    return _background.submit(fn)
+
+
+def train_lda(texts, num_topics=5, workers=None, corpus_dir=None,
+              passes=5, random_state=42, use_registry=True,
+              coherence=COHERENCE_C_V, coherence_sample=None,
+              coherence_processes=-1, background_coherence=False, weights=None):
+    # Returns (lda, topics, coherence). coherence is a CoherenceScore, None
+    # when coherence="off", or a Future of the score when
+    # background_coherence=True. weights scale each text's term counts.
+    if coherence not in COHERENCE_METRICS:
+        raise ValueError(f"Unknown coherence metric: {coherence}. Allowed: {COHERENCE_METRICS}")
+
+    params = {
+        "num_topics": num_topics,
+        "passes": passes,
+        "random_state": random_state,
+        "workers": workers,
+    }
+    coherence_id = _coherence_id(coherence, coherence_sample)
+    tokens = TokenStream(texts, weights)
+    key = model_registry.fingerprint(texts, params, weights) if use_registry else None
+
+    cached = model_registry.lookup(key) if use_registry else None
+    if cached is not None:
+        lda, dictionary, meta = cached
+        stored = meta.get("coherence")
+        stored = stored.get(coherence_id) if isinstance(stored, dict) else None
+        if coherence == COHERENCE_OFF or stored is not None:
+            score = CoherenceScore(stored["score"], coherence, stored["sample_size"],
+                                   stored["total_docs"]) if stored else None
+            return lda, lda.print_topics(), score
+    else:
+        dictionary = corpora.Dictionary(tokens)
+
+        with tempfile.TemporaryDirectory(dir=corpus_dir) as tmp_dir:
+            corpus = serialize_corpus(tokens, dictionary, os.path.join(tmp_dir, "corpus.mm"))
+
+            if workers:
+                lda = LdaMulticore(
+                    corpus=corpus,
+                    id2word=dictionary,
+                    num_topics=num_topics,
+                    passes=passes,
+                    random_state=random_state,
+                    workers=workers
+                )
+            else:
+                lda = LdaModel(
+                    corpus=corpus,
+                    id2word=dictionary,
+                    num_topics=num_topics,
+                    passes=passes,
+                    random_state=random_state
+                )
+
+            if use_registry:
+                model_registry.register(key, lda, dictionary, {"params": params, "coherence": {}})
+
+            # u_mass reuses the serialized corpus while it still exists
+            if coherence == COHERENCE_U_MASS and not background_coherence:
+                return lda, lda.print_topics(), _coherence_stage(
+                    lda, tokens, dictionary, corpus, coherence, coherence_sample,
+                    coherence_processes, random_state, key
+                )
+
+    args = (lda, tokens, dictionary, None, coherence, coherence_sample,
+            coherence_processes, random_state, key)
+    if background_coherence:
+        return lda, lda.print_topics(), _submit_background(lambda: _coherence_stage(*args))
+    return lda, lda.print_topics(), _coherence_stage(*args)
+
+
+def extend_dictionary(dictionary, tokens, max_vocab=MAX_VOCABULARY):
+    # Adds the most frequent unseen tokens of a new batch, keeping existing
+    # ids stable and the vocabulary at most max_vocab. Returns the number
+    # of tokens added.
+    batch = corpora.Dictionary(tokens)
+    room = max(0, max_vocab - len(dictionary))
+    unseen = [tid for token, tid in batch.token2id.items() if token not in dictionary.token2id]
+    unseen.sort(key=lambda tid: -batch.dfs[tid])
+    seen = [tid for token, tid in batch.token2id.items() if token in dictionary.token2id]
+
+    batch.filter_tokens(good_ids=seen + unseen[:room])
+    dictionary.merge_with(batch)
+    dictionary.id2token = {}
+    return min(room, len(unseen))
+
+
+def _expand_vocabulary(lda, dictionary):
+    # Grows the model's per-term arrays to the dictionary's size; new terms
+    # start from the prior with no sufficient statistics
+    extra = len(dictionary) - lda.num_terms
+    if extra <= 0:
+        return
+
+    eta_fill = np.full(extra, lda.eta[-1], dtype=lda.dtype)
+    lda.eta = np.concatenate([lda.eta, eta_fill])
+    lda.state.eta = np.concatenate([lda.state.eta, eta_fill])
+    lda.state.sstats = np.hstack([
+        lda.state.sstats,
+        np.zeros((lda.num_topics, extra), dtype=lda.state.sstats.dtype)
+    ])
+    lda.num_terms = len(dictionary)
+    lda.id2word = dictionary
+    lda.sync_state()
+
+
+def update_lda(texts, base_key=None, max_vocab=MAX_VOCABULARY,
+               coherence=COHERENCE_OFF, coherence_sample=None, coherence_processes=-1):
+    # Online update of a stored model with a new batch of documents only.
+    # base_key defaults to the latest registered version (or the legacy
+    # models/ files); the result is registered as a new version. Returns
+    # (lda, topics, coherence, key); coherence is measured on the batch.
+    if coherence not in COHERENCE_METRICS:
+        raise ValueError(f"Unknown coherence metric: {coherence}. Allowed: {COHERENCE_METRICS}")
+
+    if base_key is None:
+        lda, dictionary, base_key = model_registry.load_latest()
+    else:
+        cached = model_registry.lookup(base_key)
+        if cached is None:
+            raise FileNotFoundError(f"No registered LDA model with key {base_key}")
+        lda, dictionary, _ = cached
+
+    tokens = TokenStream(texts)
+    num_docs = dictionary.num_docs
+    added = extend_dictionary(dictionary, tokens, max_vocab)
+    _expand_vocabulary(lda, dictionary)
+    lda.update(BowStream(tokens, dictionary))
+
+    params = {"base": base_key, "max_vocab": max_vocab}
+    key = model_registry.fingerprint(texts, params)
+    model_registry.register(key, lda, dictionary, {
+        "params": params,
+        "parent": base_key,
+        "added_tokens": added,
+        "coherence": {},
+    })
+
+    score = _coherence_stage(
+        lda, tokens, dictionary, None, coherence, coherence_sample,
+        coherence_processes, 42, key, total_docs=dictionary.num_docs - num_docs
+    )
+    return lda, lda.print_topics(), score, key
+
+
+def _sweep_candidate(corpus_path, dictionary_path, num_topics, passes, random_state):
+    # Runs in a worker process: every worker reads the same serialized
+    # corpus and dictionary from disk instead of receiving a pickled copy
+    corpus = corpora.MmCorpus(corpus_path)
+    dictionary = corpora.Dictionary.load(dictionary_path)
+
+    start = time.perf_counter()
     lda = LdaModel(
         corpus=corpus,
         id2word=dictionary,
         num_topics=num_topics,
-        passes=5,
-        random_state=42
+        passes=passes,
+        random_state=random_state
     )
+    train_seconds = time.perf_counter() - start
 
-    lda.save("models/lda_model.model")
-    dictionary.save("models/lda_dictionary.dict")
-
-    coherence_model = CoherenceModel(
+    coherence = CoherenceModel(
         model=lda,
-        texts=tokens,
+        corpus=corpus,
         dictionary=dictionary,
-        coherence='c_v'
-    )
+        coherence=COHERENCE_U_MASS
+    ).get_coherence()
+    return {
+        "num_topics": num_topics,
+        "coherence": coherence,
+        "train_seconds": train_seconds,
+    }
+
+
+def sweep_num_topics(texts, candidates=range(2, 16), passes=5, random_state=42,
+                     max_workers=None, patience=3, min_delta=0.01, corpus_dir=None):
+    # Trains one model per candidate topic count in a process pool and scores
+    # it with u_mass coherence. Candidates are consumed in order; the sweep
+    # stops once `patience` consecutive candidates fail to beat the best
+    # score by min_delta. Returns a DataFrame ranked by coherence.
+    max_workers = max_workers or os.cpu_count() or 1
+    tokens = TokenStream(texts)
+    dictionary = corpora.Dictionary(tokens)
+
+    rows = []
+    with tempfile.TemporaryDirectory(dir=corpus_dir) as tmp_dir:
+        corpus_path = os.path.join(tmp_dir, "corpus.mm")
+        dictionary_path = os.path.join(tmp_dir, "dictionary.dict")
+        corpora.MmCorpus.serialize(corpus_path, BowStream(tokens, dictionary))
+        dictionary.save(dictionary_path)
+
+        remaining = iter(candidates)
+        pending = deque()
+        best = -np.inf
+        stale = 0
+
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            def fill():
+                while len(pending) < max_workers:
+                    num_topics = next(remaining, None)
+                    if num_topics is None:
+                        return
+                    pending.append(pool.submit(
+                        _sweep_candidate, corpus_path, dictionary_path,
+                        num_topics, passes, random_state
+                    ))
+
+            fill()
+            while pending:
+                row = pending.popleft().result()
+                rows.append(row)
 
-    coherence_score = coherence_model.get_coherence()
+                if row["coherence"] > best + min_delta:
+                    best = row["coherence"]
+                    stale = 0
+                else:
+                    stale += 1
+                if stale >= patience:
+                    for future in pending:
+                        future.cancel()
+                    break
+                fill()
 
-    return lda, lda.print_topics(), coherence_score
+    results = pd.DataFrame(rows, columns=["num_topics", "coherence", "train_seconds"])
+    results = results.sort_values("coherence", ascending=False, ignore_index=True)
+    results.insert(0, "rank", range(1, len(results) + 1))
+    return results
@@ -1,24 +1,16 @@
 import os
-import re
-import pickle
 import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
-from wordcloud import WordCloud
 
-import spacy
-from gensim.models import LdaModel
-from gensim.corpora import Dictionary
-from gensim.utils import simple_preprocess
-
-from nltk.corpus import stopwords
-
-import plotly.express as px
-import plotly.graph_objects as go
-
-from validation import read_file, basic_checks
-from summarizer import summarize_text
+# torch/transformers, spaCy, gensim, plotly, wordcloud and matplotlib are
+# imported where they are used (and pre-imported by the warm-up thread),
+# so the first render does not wait for them
+from validation import read_file, read_rows, basic_checks
+from summarizer import DEFAULT_PRESET, PRESETS, preset_kwargs
+from summary_cache import cache_stats
 from reporting import build_docx_report, generate_insights_and_recommendations
+from warmup import IMPORT_TIMES
+from model_client import LocalBackend, ModelClient, start_local_warmup
 
 st.set_page_config(
     layout="wide",
@@ -26,8 +18,13 @@ st.set_page_config(
     page_icon="🧠"
 )
 
-px.defaults.template = "plotly_dark"
-px.defaults.color_continuous_scale = "Blues"
+def plotly_modules():
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    px.defaults.template = "plotly_dark"
+    px.defaults.color_continuous_scale = "Blues"
+    return px, go
 
 APP_CSS = """
 <style>
@@ -159,112 +156,63 @@ NEUTRAL_LOW = 0.40
 NEUTRAL_HIGH = 0.60
 SUMMARY_MIN_LEN = 40
 SUMMARY_MAX_LEN = 90
-SUMMARY_BEAMS = 4
+SUMMARY_QUANTIZED = False
+SUMMARY_BUDGET_SECONDS = 15  # beyond this, fall back to an extractive summary
 
-# ----- PATHS -----
-BASE_DIR = "saved_models"
-LDA_PATH = os.path.join(BASE_DIR, "ldaModel.gensim")
-DICT_PATH = os.path.join(BASE_DIR, "ldaDictionary.gensim")
-PHRASERS_PATH = os.path.join(BASE_DIR, "Phrasers.pkl")
-SENTIMENT_MODEL_PATH = os.path.join(BASE_DIR, "sentiment_model.pkl")
-VECTORIZER_PATH = os.path.join(BASE_DIR, "tfidf_vectorizer.pkl")
+HEAVY_MODULES = ("torch", "transformers", "spacy", "gensim", "plotly.express", "wordcloud", "nltk")
+# Optional shared model server (python model_server.py); unset runs in-process
+MODEL_SERVER_URL = os.environ.get("MODEL_SERVER_URL")
 
 # ----- LOAD RESOURCES -----
 @st.cache_resource
-def load_nlp():
-    return spacy.load("en_core_web_sm")
-
-@st.cache_resource
-def load_artifacts():
-    try:
-        lda = LdaModel.load(LDA_PATH)
-        id2word = Dictionary.load(DICT_PATH)
-    except Exception as e:
-        raise RuntimeError(f"Failed to load LDA or Dictionary: {e}")
-    
-    try:
-        with open(PHRASERS_PATH, "rb") as f:
-            ph = pickle.load(f)
-        bigram_mod, trigram_mod = ph.get("bigram_mod"), ph.get("trigram_mod")
-        if bigram_mod is None or trigram_mod is None:
-            raise ValueError("Phrasers.pkl missing 'bigram_mod' or 'trigram_mod' keys.")
-    except Exception as e:
-        raise RuntimeError(f"Failed to load phrasers: {e}")
-
-    try:
-        with open(SENTIMENT_MODEL_PATH, "rb") as f:
-            sentiment_model = pickle.load(f)
-        with open(VECTORIZER_PATH, "rb") as f:
-            vectorizer = pickle.load(f)
-    except Exception as e:
-        raise RuntimeError(f"Failed to load sentiment model/vectorizer: {e}")
-
-    return lda, id2word, bigram_mod, trigram_mod, sentiment_model, vectorizer
-
-nlp = load_nlp()
-stop_words = stopwords.words("english")
-preserve_words = {
-    "no","not","never","none","nobody","nothing","neither","nor",
-    "very","too","so","such","just","only","really","even",
-    "but","yet","though","although","while",
-    "hardly","barely","scarcely"
-}
+def connect_backend():
+    # One backend per Streamlit process, shared by every session. With a
+    # model server the models live there and nothing is loaded here unless
+    # the server becomes unreachable; otherwise warm up in-process, loading
+    # in the order the models are needed (BART is by far the slowest)
+    if MODEL_SERVER_URL:
+        client = ModelClient(
+            MODEL_SERVER_URL,
+            fallback=lambda: LocalBackend(start_local_warmup(SUMMARY_QUANTIZED), SUMMARY_QUANTIZED)
+        )
+        if client.health():
+            return client, None
+    warmup = start_local_warmup(SUMMARY_QUANTIZED, imports=HEAVY_MODULES)
+    return LocalBackend(warmup, SUMMARY_QUANTIZED), warmup
+
+backend, warmup = connect_backend()
 
 # ----- SESSION STATE -----
 if 'analyzed' not in st.session_state:
     st.session_state.analyzed = False
 if 'results' not in st.session_state:
     st.session_state.results = {}
+if 'dataset_results' not in st.session_state:
+    st.session_state.dataset_results = None
 
-def clean_text_sentiment(text):
-    text = str(text).lower()
-    text = re.sub(r'[^a-z\s]', ' ', text)
-    doc = nlp(text)
-    tokens = []
-    for token in doc:
-        if token.text in stop_words and token.text not in preserve_words:
-            continue
-        tokens.append(token.lemma_)
-    return " ".join(tokens)
-
-def clean_text(text):
-    # Keep only letters, collapse whitespace, lowercase
-    text = re.sub(r"<.*?>", " ", str(text))
-    text = re.sub(r"[^a-zA-Z]", " ", text)
-    text = re.sub(r"\s+", " ", text).strip().lower()
-    return text
-
-def tokenize(text, min_len=3):
-    return [
-        tok for tok in simple_preprocess(text, deacc=True)
-        if tok not in stop_words and len(tok) >= min_len
-    ]
-
-def build_phrases(tokens_list, bigram_model, trigram_model):
-    # Apply bigram then trigram
-    bigrammed = [bigram_model[doc] for doc in tokens_list]
-    trigrammed = [trigram_model[doc] for doc in bigrammed]
-    return trigrammed
-
-def lemmatization(token_docs, allowed_postags=("NOUN","ADJ","VERB","ADV")):
-    texts_out = []
-    for doc_tokens in token_docs:
-        doc = nlp(" ".join(doc_tokens))
-        texts_out.append([token.lemma_ for token in doc if token.pos_ in allowed_postags])
-    return texts_out
-
-def infer_topics(texts):
+def analyze_rows(texts):
     """
-    texts: list of raw strings
-    returns: list of (bow, topic_dist) per doc
+    texts: Series of raw review strings, one per CSV row
+    returns: DataFrame with sentiment probabilities and dominant topic per row
     """
-    cleaned = [clean_text(t) for t in texts]
-    tokenized = [tokenize(t) for t in cleaned]
-    phrased = build_phrases(tokenized, bigram_model, trigram_model)
-    lemmatized = lemmatization(phrased)
-    bows = [dictionary.doc2bow(doc) for doc in lemmatized]
-    topic_dists = [lda_model.get_document_topics(bow, minimum_probability=0.0) for bow in bows]
-    return bows, topic_dists, lemmatized
+    import numpy as np
+
+    results = backend.analyze(texts.tolist())
+    prob_pos = np.array([r["prob_pos"] for r in results])
+    topic_dists = np.array([r["topic_dist"] for r in results])
+    label = np.select(
+        [prob_pos > NEUTRAL_HIGH, prob_pos < NEUTRAL_LOW],
+        ["Positive", "Negative"],
+        default="Neutral"
+    )
+    return pd.DataFrame({
+        "text": texts.to_numpy(),
+        "sentiment": label,
+        "prob_pos": prob_pos,
+        "prob_neg": [r["prob_neg"] for r in results],
+        "dominant_topic": topic_dists.argmax(axis=1),
+        "topic_prob": topic_dists.max(axis=1),
+    }, index=texts.index)
 
 def get_dominant_topic(topic_dist):
     """
@@ -275,16 +223,13 @@ def get_dominant_topic(topic_dist):
         return None, 0.0
     return max(topic_dist, key = lambda x: x[1])
 
-def topic_keywords(lda, topic_id, topn=10):
-    raw_output = lda.show_topic(topic_id, topn=topn)
-    return raw_output
-
 # ----- VISUALISATIONS -----
 def plot_sentiment_bars(prob_neg, prob_pos):
     df = pd.DataFrame({
         "Sentiment": ["Negative", "Positive"],
         "Probability": [prob_neg, prob_pos]
     })
+    px, _ = plotly_modules()
     fig = px.bar(
         df, x="Sentiment", y="Probability",
         color="Sentiment",
@@ -296,6 +241,7 @@ def plot_sentiment_bars(prob_neg, prob_pos):
     return fig
 
 def plot_sentiment_gauge(prob_pos):
+    _, go = plotly_modules()
     fig = go.Figure(go.Indicator(
         mode = "gauge+number",
         value = prob_pos * 100,
@@ -327,6 +273,7 @@ def plot_topic_keywords_bar(keywords):
     
     df = pd.DataFrame({'Word': words, 'Importance': probs}).sort_values('Importance', ascending=True)
     
+    px, _ = plotly_modules()
     fig = px.bar(
         df, x='Importance', y='Word', 
         orientation='h',
@@ -338,15 +285,30 @@ def save_static_plot(fig, filename):
     fig.savefig(filename, format="png", bbox_inches="tight")
     return filename
 
-try:
-    lda_model, dictionary, bigram_model, trigram_model, sentiment_model, vectorizer = load_artifacts()
-except Exception as e:
-    st.error(str(e))
-    st.stop()
+def render_warmup_status():
+    if warmup is None:
+        st.caption(f"Models: served by {MODEL_SERVER_URL}")
+        return
+    icons = {"ready": "✅", "loading": "⏳", "failed": "❌"}
+    parts = []
+    for name, state in warmup.status().items():
+        seconds = warmup.seconds.get(name)
+        parts.append(f"{icons[state]} {name}" + (f" ({seconds:.1f}s)" if seconds is not None else ""))
+    st.caption("Models: " + " · ".join(parts))
+    # Shown, not raised: the rest of the page still renders, and a failed
+    # model only fails the step that needs it
+    for name, e in dict(warmup.errors).items():
+        st.error(f"{name} failed to load: {e}")
+    if IMPORT_TIMES:
+        with st.expander("Startup timings"):
+            timings = pd.DataFrame(sorted(IMPORT_TIMES.items(), key=lambda kv: kv[1], reverse=True), columns=["Module", "Import (s)"])
+            st.dataframe(timings, hide_index=True)
 
 # UI
 st.title("Food Review Analysis Platform")
 st.markdown("Analyze reviews with topic modeling, sentiment, and summarization—beautifully and clearly.")
+# Poll while models load; once a full rerun sees them ready, polling stops
+st.fragment(render_warmup_status, run_every=None if warmup is None or warmup.is_ready() else 1)()
 
 # Input Section
 col1, col2 = st.columns([1, 2])
@@ -368,11 +330,49 @@ if uploaded_file:
     except Exception as e:
         st.error(f"Failed to read file: {e}")
         raw_text = ""
+    is_csv = uploaded_file.name.lower().endswith(".csv")
+    dataset_mode = is_csv and st.toggle("Analyze each row separately (dataset mode)", value=False)
 elif text_input and text_input.strip():
     raw_text = text_input.strip()
 else:
     raw_text = ""
 
+if uploaded_file and dataset_mode:
+    if st.button("📊 Analyze Rows", type="primary"):
+        with st.spinner("Scoring rows..."):
+            try:
+                uploaded_file.seek(0)
+                st.session_state.dataset_results = {
+                    "file_id": uploaded_file.file_id,
+                    "rows": analyze_rows(read_rows(uploaded_file))
+                }
+            except Exception as e:
+                st.error(f"Dataset analysis failed: {e}")
+
+    # Only show results that belong to the file uploaded now; every new
+    # upload gets a new file_id
+    stored = st.session_state.dataset_results
+    rows_df = stored["rows"] if stored is not None and stored["file_id"] == uploaded_file.file_id else None
+    if rows_df is not None:
+        d1, d2, d3 = st.columns(3)
+        d1.metric("Rows", f"{len(rows_df):,}")
+        d2.metric("Positive", f"{(rows_df['sentiment'] == 'Positive').mean():.0%}")
+        d3.metric("Most common topic", f"Topic {rows_df['dominant_topic'].mode().iat[0]}")
+        st.dataframe(rows_df, use_container_width=True)
+        st.download_button(
+            "📥 Download results CSV",
+            rows_df.to_csv(index_label="row").encode("utf-8"),
+            file_name="row_results.csv",
+            mime="text/csv"
+        )
+    st.stop()
+
+with st.expander("Summary settings"):
+    summary_preset = st.selectbox("Quality / latency preset", list(PRESETS), index=list(PRESETS).index(DEFAULT_PRESET))
+    summary_max_len = st.slider("Max summary length (tokens)", SUMMARY_MIN_LEN + 10, 200, SUMMARY_MAX_LEN, step=10)
+    # Defaults to the variant already loaded (by the server or the warm-up)
+    summary_quantized = st.checkbox("Use int8 model (faster on CPU)", value=backend.default_quantized)
+
 analyze_btn = st.button("🚀 Analyze Text", type="primary", disabled=not raw_text)
 
 if analyze_btn:
@@ -383,11 +383,14 @@ if analyze_btn:
             st.warning(msg)
         else:
             try:
-                # Topic Modeling
-                bows, topic_dists, lemmatized = infer_topics([raw_text])
-                dom_tid, dom_prob = get_dominant_topic(topic_dists[0])
-
-                top_keywords_weighted = topic_keywords(lda_model, dom_tid, topn=15)
+                # Sentiment and topics from one spaCy pass (on the model
+                # server when there is one)
+                analysis = backend.analyze([raw_text])[0]
+                topic_dist = list(enumerate(analysis["topic_dist"]))
+                dom_tid, dom_prob = get_dominant_topic(topic_dist)
+
+                keywords_by_topic = backend.topic_keywords(topn=15)
+                top_keywords_weighted = keywords_by_topic[dom_tid]
                 top_words_list = []
                 for item in top_keywords_weighted:
                     if isinstance(item, (tuple, list)) and len(item) >= 2:
@@ -396,25 +399,25 @@ if analyze_btn:
                         top_words_list.append(str(item))
 
                 # Sentiment
-                cleaned_sent = clean_text_sentiment(raw_text)
-                vec = vectorizer.transform([cleaned_sent])
-                probs = sentiment_model.predict_proba(vec)[0] # [prob_0, prob_1]
-                prob_neg, prob_pos = probs[0], probs[1]
+                prob_neg, prob_pos = analysis["prob_neg"], analysis["prob_pos"]
 
-                # Summarization
-                try:
-                    summary = summarize_text(raw_text, min_length=SUMMARY_MIN_LEN, max_length=SUMMARY_MAX_LEN, num_beams=SUMMARY_BEAMS)
-                except:
-                    summary = "Summarizer unavailable."
+                # Summarization, bounded by SUMMARY_BUDGET_SECONDS
+                summary, summary_report = backend.summarize(
+                    raw_text,
+                    budget_seconds=SUMMARY_BUDGET_SECONDS,
+                    min_length=SUMMARY_MIN_LEN,
+                    quantized=summary_quantized,
+                    **preset_kwargs(summary_preset, max_length=summary_max_len)
+                )
 
                 # Insights
                 # Build map for reporting
-                topic_words_map = {tid: [w for w, p in topic_keywords(lda_model, tid, topn=10)] for tid in range(lda_model.num_topics)}
+                topic_words_map = {tid: [w for w, p in words[:10]] for tid, words in enumerate(keywords_by_topic)}
                 insights, recs = generate_insights_and_recommendations(topic_words_map, prob_pos)
 
                 # Store in Session State
                 st.session_state.results = {
-                    "topic_dist": topic_dists[0],
+                    "topic_dist": topic_dist,
                     "dom_topic": dom_tid,
                     "dom_prob": dom_prob,
                     "top_keywords_weighted": top_keywords_weighted, # [(word, prob)...]
@@ -422,6 +425,7 @@ if analyze_btn:
                     "prob_pos": prob_pos,
                     "prob_neg": prob_neg,
                     "summary": summary,
+                    "summary_report": summary_report,
                     "insights": insights,
                     "recs": recs
                 }
@@ -433,6 +437,9 @@ if analyze_btn:
 
 # --- DISPLAY RESULTS ---
 if st.session_state.analyzed:
+    import matplotlib.pyplot as plt
+    from wordcloud import WordCloud
+
     res = st.session_state.results
     # Logic for Labels
     p_pos = res['prob_pos']
@@ -529,6 +536,20 @@ if st.session_state.analyzed:
     with tab_sum:
         st.subheader("Summary")
         st.info(res['summary'])
+        summary_report = res.get('summary_report', {})
+        if summary_report.get('method') == "extractive":
+            st.caption(f"Extractive summary (TF-IDF key sentences): {summary_report['reason']}.")
+        elif summary_report.get('method') == "bart":
+            st.caption("Abstractive summary (BART).")
+        levels = summary_report.get('levels', [])
+        if summary_report.get('method') == "bart" and len(levels) > 1:
+            st.caption(
+                f"Summarized {levels[0]['chunks']} chunks over {len(levels)} levels: "
+                + ", ".join(f"L{i + 1} {lvl['chunks']} chunk(s) in {lvl['seconds']:.1f}s" for i, lvl in enumerate(levels))
+            )
+        stats = cache_stats()
+        if stats['hits'] + stats['misses']:
+            st.caption(f"Summary cache: {stats['hits']} hits / {stats['hits'] + stats['misses']} lookups ({stats['hit_rate']:.0%})")
         sc1, sc2 = st.columns(2)
         with sc1:
             st.markdown("### 💡 Key Insights")
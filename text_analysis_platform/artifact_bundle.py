@@ -0,0 +1,431 @@
+import argparse
+import copy
+import hashlib
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from fast_sentiment import VERIFY_TOLERANCE, CompiledSentiment, probe_texts, word_analyzer
+
+# Bump when the file layout changes; older bundles are then ignored
+BUNDLE_VERSION = 1
+MANIFEST = "manifest.json"
+KEYWORDS_TOPN = 50  # keywords kept per topic; the app shows at most 15
+LDA_TOLERANCE = 1e-4  # on normalised topic probabilities, from the same start
+
+class BundleDictionary:
+    """
+    The parts of gensim's Dictionary the analyzer uses, built from a word
+    list whose line numbers are the token ids.
+    """
+
+    def __init__(self, id2token):
+        self.id2token = id2token
+        self.token2id = {token: i for i, token in enumerate(id2token)}
+
+    def __len__(self):
+        return len(self.id2token)
+
+    def __getitem__(self, token_id):
+        return self.id2token[token_id]
+
+    def doc2bow(self, document):
+        counts = {}
+        for word in document:
+            token_id = self.token2id.get(word)
+            if token_id is not None:
+                counts[token_id] = counts.get(token_id, 0) + 1
+        return sorted(counts.items())
+
+class BundleLda:
+    """
+    Topic inference from a memory-mapped (vocab, topics) exp(E[log beta])
+    matrix. The updates are gensim's LdaModel.inference, run for the whole
+    chunk at once with each document still stopping at its own convergence
+    point. gamma starts at its prior mean (all ones) instead of a random
+    draw, so results are deterministic and agree with gensim to within its
+    convergence threshold.
+    """
+
+    def __init__(self, word_topics, alpha, iterations, gamma_threshold, keywords, keywords_topn=KEYWORDS_TOPN):
+        self.word_topics = word_topics
+        self.dtype = word_topics.dtype
+        self.alpha = np.asarray(alpha, dtype=self.dtype)
+        self.num_topics = word_topics.shape[1]
+        self.iterations = iterations
+        self.gamma_threshold = gamma_threshold
+        self.keywords = keywords
+        self.keywords_topn = keywords_topn
+
+    def inference(self, chunk, start=None):
+        """
+        Returns (gamma, None) like gensim; start is an optional
+        (len(chunk), num_topics) initial gamma.
+        """
+        from scipy.special import psi
+
+        def exp_dirichlet_expectation(g):
+            return np.exp(psi(g) - psi(g.sum(axis=1, keepdims=True))).astype(self.dtype, copy=False)
+
+        epsilon = np.finfo(self.dtype).eps
+        lengths = np.fromiter((len(doc) for doc in chunk), dtype=np.intp, count=len(chunk))
+        # Empty documents converge to alpha on the first update, as in gensim
+        gamma = np.tile(self.alpha, (len(chunk), 1))
+
+        docs = np.flatnonzero(lengths)  # chunk index of each active document
+        lengths = lengths[docs]
+        ids = np.fromiter((i for doc in chunk for i, _ in doc), dtype=np.intp, count=lengths.sum())
+        cts = np.fromiter((c for doc in chunk for _, c in doc), dtype=self.dtype, count=len(ids))
+        # Gathering rows touches only the pages of words that occur
+        exp_elog_beta = self.word_topics[ids]
+
+        if start is None:
+            gammad = np.ones((len(docs), self.num_topics), dtype=self.dtype)
+        else:
+            gammad = np.asarray(start, dtype=self.dtype)[docs]
+        for _ in range(self.iterations):
+            if not len(docs):
+                break
+            starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            exp_elog_theta = exp_dirichlet_expectation(gammad)
+            phinorm = np.einsum("nk,nk->n", np.repeat(exp_elog_theta, lengths, axis=0), exp_elog_beta) + epsilon
+            last_gamma = gammad
+            gammad = self.alpha + exp_elog_theta * np.add.reduceat(exp_elog_beta * (cts / phinorm)[:, None], starts, axis=0)
+
+            converged = np.mean(np.abs(gammad - last_gamma), axis=1) < self.gamma_threshold
+            gamma[docs] = gammad
+            if converged.any():
+                keep = ~converged
+                entries = np.repeat(keep, lengths)
+                docs, lengths, gammad = docs[keep], lengths[keep], gammad[keep]
+                exp_elog_beta, cts = exp_elog_beta[entries], cts[entries]
+        return gamma, None
+
+    def show_topic(self, topicid, topn=10):
+        if topn > self.keywords_topn:
+            raise ValueError(f"The bundle keeps {self.keywords_topn} keywords per topic, not {topn}")
+        return self.keywords[topicid][:topn]
+
+class BundlePhraser:
+    """
+    Applies a frozen gensim Phrases model from its exported phrase list,
+    with the same left-to-right matching and connector-word handling.
+    """
+
+    def __init__(self, phrases, delimiter="_", connector_words=()):
+        self.phrases = frozenset(phrases)
+        self.delimiter = delimiter
+        self.connector_words = frozenset(connector_words)
+
+    def __getitem__(self, sentence):
+        out, start, between = [], None, []
+        for word in sentence:
+            if word in self.connector_words:
+                if start:
+                    between.append(word)
+                else:
+                    out.append(word)
+                continue
+            if start:
+                phrase = self.delimiter.join([start] + between + [word])
+                if phrase in self.phrases:
+                    out.append(phrase)
+                    start, between = None, []
+                    continue
+                out.append(start)
+                out.extend(between)
+            start, between = word, []
+        if start:
+            out.append(start)
+            out.extend(between)
+        return out
+
+# ----- READING -----
+def _read_words(path):
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    return text.split("\n") if text else []
+
+def bundle_is_current(bundle_dir, source_paths):
+    """
+    True if bundle_dir holds a bundle of this version that was built from
+    exactly the source files that exist now. A source whose size and mtime
+    match the manifest is trusted as is; one whose mtime differs (copied or
+    extracted files) is trusted only if its sha256 still matches.
+    """
+    try:
+        with open(os.path.join(bundle_dir, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if manifest.get("version") != BUNDLE_VERSION:
+        return False
+
+    recorded = manifest.get("sources")
+    current = {os.path.basename(p): p for p in source_paths if os.path.exists(p)}
+    if not isinstance(recorded, dict) or set(recorded) != set(current):
+        return False
+    try:
+        for name, p in current.items():
+            stamp = recorded[name]
+            if not isinstance(stamp, dict):
+                stamp = {"sha256": stamp}  # bundles built before sizes were recorded
+            stat = os.stat(p)
+            if stat.st_size == stamp.get("size") and stat.st_mtime_ns == stamp.get("mtime_ns"):
+                continue
+            if "size" in stamp and stat.st_size != stamp["size"]:
+                return False
+            if _sha256(p) != stamp.get("sha256"):
+                return False
+    except OSError:
+        return False
+    return True
+
+def load_bundle(bundle_dir, mmap_mode="r"):
+    """
+    Returns the same 7-tuple as pipeline.load_artifacts. Arrays are
+    memory-mapped read-only, so every process serving the app shares one
+    copy of their pages. The sklearn model and vectorizer slots are None;
+    sentiment is scored by the CompiledSentiment table alone.
+    """
+    def path(name):
+        return os.path.join(bundle_dir, name)
+
+    with open(path(MANIFEST), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != BUNDLE_VERSION:
+        raise ValueError(f"Bundle version {manifest.get('version')} is not {BUNDLE_VERSION}")
+
+    lda_meta = manifest["lda"]
+    with open(path("topic_keywords.json"), encoding="utf-8") as f:
+        keywords = [[(word, prob) for word, prob in topic] for topic in json.load(f)]
+    lda = BundleLda(
+        np.load(path("lda_word_topics.npy"), mmap_mode=mmap_mode),
+        lda_meta["alpha"],
+        lda_meta["iterations"],
+        lda_meta["gamma_threshold"],
+        keywords,
+        lda_meta["keywords_topn"],
+    )
+    dictionary = BundleDictionary(_read_words(path("lda_vocab.txt")))
+
+    phrasers = manifest["phrasers"]
+    bigram_mod, trigram_mod = (
+        BundlePhraser(_read_words(path(f"{name}_phrases.txt")), phrasers["delimiter"], phrasers[name]["connector_words"])
+        for name in ("bigram", "trigram")
+    )
+
+    sentiment = manifest["sentiment"]
+    idf = np.load(path("sentiment_idf.npy"), mmap_mode=mmap_mode) if sentiment["use_idf"] else None
+    fast_sentiment = CompiledSentiment(
+        _read_words(path("sentiment_vocab.txt")),
+        np.load(path("sentiment_coef.npy"), mmap_mode=mmap_mode),
+        idf,
+        sentiment["intercept"],
+        word_analyzer(sentiment["token_pattern"], sentiment["lowercase"], tuple(sentiment["ngram_range"]), sentiment["stop_words"]),
+        sentiment["binary"],
+        sentiment["sublinear_tf"],
+        sentiment["norm"],
+    )
+
+    return lda, dictionary, bigram_mod, trigram_mod, None, None, fast_sentiment
+
+# ----- BUILDING -----
+def _write_words(path, words):
+    words = list(words)
+    if any("\n" in w for w in words):
+        raise ValueError(f"{os.path.basename(path)}: a term contains a newline")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(words))
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _source_stamp(path):
+    # Stat first, so a file replaced while it is hashed does not match later
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": _sha256(path)}
+
+def _phrase_list(phraser):
+    # gensim 4 keys phrasegrams by the joined phrase; older Phraser pickles
+    # use tuples of words
+    delimiter = phraser.delimiter.decode("utf-8") if isinstance(phraser.delimiter, bytes) else phraser.delimiter
+    phrases = []
+    for phrase, score in phraser.phrasegrams.items():
+        if isinstance(score, tuple):
+            score = score[-1]
+        if score <= phraser.threshold:
+            continue  # gensim never joins these
+        if isinstance(phrase, tuple):
+            phrase = delimiter.join(w.decode("utf-8") if isinstance(w, bytes) else w for w in phrase)
+        phrases.append(phrase)
+    return sorted(phrases), delimiter
+
+def _sentiment_config(vectorizer, model):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+
+    if not isinstance(vectorizer, TfidfVectorizer) or not isinstance(model, LogisticRegression):
+        raise ValueError("Only a TfidfVectorizer + LogisticRegression sentiment model can be bundled")
+    if len(model.classes_) != 2:
+        raise ValueError("Only a binary sentiment model can be bundled")
+    if (vectorizer.analyzer != "word" or vectorizer.preprocessor or vectorizer.tokenizer
+            or vectorizer.strip_accents or vectorizer.input != "content"):
+        raise ValueError("Only the default word analyzer can be bundled")
+    stop_words = vectorizer.get_stop_words()
+    return {
+        "token_pattern": vectorizer.token_pattern,
+        "lowercase": vectorizer.lowercase,
+        "ngram_range": list(vectorizer.ngram_range),
+        "stop_words": sorted(stop_words) if stop_words else None,
+        "binary": vectorizer.binary,
+        "sublinear_tf": vectorizer.sublinear_tf,
+        "norm": vectorizer.norm,
+        "use_idf": vectorizer.use_idf,
+        "intercept": float(model.intercept_[0]),
+        "classes": [str(c) for c in model.classes_],
+    }
+
+def _probe_docs(id2token, n_docs=200, words_per_doc=30, seed=0):
+    rng = random.Random(seed)
+    return [rng.choices(id2token, k=rng.randint(0, words_per_doc)) for _ in range(n_docs)]
+
+def _probe_sentences(phrases, delimiter, n=300, seed=0):
+    # Phrase parts in random order, so both matches and near misses occur
+    rng = random.Random(seed)
+    words = sorted({w for p in phrases for w in p.split(delimiter)}) or ["a"]
+    return [rng.choices(words, k=12) for _ in range(n)]
+
+def verify_bundle(bundle_dir, artifacts):
+    """
+    Loads the bundle and compares it with the original models. Raises
+    ValueError on the first mismatch.
+    """
+    lda, id2word, bigram_mod, trigram_mod, sentiment_model, vectorizer, _ = artifacts
+    b_lda, b_dict, b_bigram, b_trigram, _, _, b_sentiment = load_bundle(bundle_dir)
+
+    docs = _probe_docs([id2word[i] for i in range(len(id2word))])
+    bows = [id2word.doc2bow(doc) for doc in docs]
+    if bows != [b_dict.doc2bow(doc) for doc in docs]:
+        raise ValueError("Bundled dictionary disagrees with the gensim Dictionary")
+
+    # Start from the gamma gensim is about to draw, so any difference is in
+    # the updates rather than in the random start
+    start = copy.deepcopy(lda.random_state).gamma(100., 1. / 100., (len(bows), lda.num_topics))
+    expected, _ = lda.inference(bows)
+    actual, _ = b_lda.inference(bows, start)
+    error = np.abs(expected / expected.sum(axis=1, keepdims=True) - actual / actual.sum(axis=1, keepdims=True)).max()
+    if error > LDA_TOLERANCE:
+        raise ValueError(f"Bundled LDA inference is off by {error:.2e}")
+
+    for name, original, bundled in (("bigram", bigram_mod, b_bigram), ("trigram", trigram_mod, b_trigram)):
+        for sentence in _probe_sentences(bundled.phrases, bundled.delimiter) + docs:
+            if original[sentence] != bundled[sentence]:
+                raise ValueError(f"Bundled {name} phraser disagrees on {sentence}")
+
+    error = b_sentiment.max_error(vectorizer, sentiment_model, probe_texts(vectorizer))
+    if error > VERIFY_TOLERANCE:
+        raise ValueError(f"Bundled sentiment model is off by {error:.2e}")
+
+def build_bundle(bundle_dir, artifacts, source_paths=()):
+    """
+    Compiles the models returned by pipeline.load_pickled_artifacts into
+    bundle_dir. The bundle is written to a temporary directory next to it,
+    verified, and only then swapped in, so readers never see a partial one.
+    """
+    lda, id2word, bigram_mod, trigram_mod, sentiment_model, vectorizer, _ = artifacts
+
+    id2token = [id2word[i] for i in range(len(id2word))]
+    if sorted(id2word.keys()) != list(range(len(id2word))):
+        raise ValueError("Dictionary ids are not contiguous; call compactify() before bundling")
+    sentiment = _sentiment_config(vectorizer, sentiment_model)
+
+    parent = os.path.dirname(os.path.abspath(bundle_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".bundle-")
+    try:
+        def path(name):
+            return os.path.join(tmp_dir, name)
+
+        np.save(path("lda_word_topics.npy"), np.ascontiguousarray(lda.expElogbeta.T))
+        _write_words(path("lda_vocab.txt"), id2token)
+        with open(path("topic_keywords.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                [
+                    [(word, float(prob)) for word, prob in lda.show_topic(tid, topn=KEYWORDS_TOPN)]
+                    for tid in range(lda.num_topics)
+                ],
+                f,
+            )
+
+        phrasers = {}
+        for name, phraser in (("bigram", bigram_mod), ("trigram", trigram_mod)):
+            phrases, phrasers["delimiter"] = _phrase_list(phraser)
+            _write_words(path(f"{name}_phrases.txt"), phrases)
+            connector_words = getattr(phraser, "connector_words", getattr(phraser, "common_terms", ()))
+            phrasers[name] = {"phrases": len(phrases), "connector_words": sorted(connector_words)}
+
+        terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+        _write_words(path("sentiment_vocab.txt"), terms)
+        np.save(path("sentiment_coef.npy"), np.ascontiguousarray(sentiment_model.coef_[0], dtype=np.float64))
+        if vectorizer.use_idf:
+            np.save(path("sentiment_idf.npy"), np.ascontiguousarray(vectorizer.idf_, dtype=np.float64))
+
+        manifest = {
+            "version": BUNDLE_VERSION,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "sources": {os.path.basename(p): _source_stamp(p) for p in source_paths if os.path.exists(p)},
+            "lda": {
+                "num_topics": lda.num_topics,
+                "alpha": [float(a) for a in np.atleast_1d(lda.alpha)],
+                "iterations": lda.iterations,
+                "gamma_threshold": lda.gamma_threshold,
+                "dtype": str(lda.expElogbeta.dtype),
+                "keywords_topn": KEYWORDS_TOPN,
+            },
+            "phrasers": phrasers,
+            "sentiment": sentiment,
+        }
+        # Written last, so a bundle without a manifest is never used
+        with open(path(MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        verify_bundle(tmp_dir, artifacts)
+        os.chmod(tmp_dir, 0o755)  # mkdtemp creates it private to this user
+
+        old_dir = None
+        if os.path.exists(bundle_dir):
+            old_dir = tempfile.mkdtemp(dir=parent, prefix=".bundle-old-")
+            os.replace(bundle_dir, os.path.join(old_dir, "bundle"))
+        os.replace(tmp_dir, bundle_dir)
+        if old_dir:
+            # Processes that still map the old files keep them until they exit
+            shutil.rmtree(old_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return manifest
+
+if __name__ == "__main__":
+    from pipeline import BUNDLE_DIR, SOURCE_PATHS, load_pickled_artifacts
+
+    parser = argparse.ArgumentParser(description="Compile the saved models into one memory-mappable bundle")
+    parser.add_argument("--out", default=BUNDLE_DIR, help="bundle directory")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    manifest = build_bundle(args.out, load_pickled_artifacts(), SOURCE_PATHS)
+    print(f"Built bundle v{manifest['version']} in {args.out} ({time.perf_counter() - start:.1f}s)")
+
+    start = time.perf_counter()
+    load_bundle(args.out)
+    print(f"Bundle loads in {(time.perf_counter() - start) * 1000:.1f} ms")
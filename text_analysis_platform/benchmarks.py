@@ -0,0 +1,105 @@
+import time
+from collections import Counter
+
+from summarizer import DEFAULT_PRESET, PRESETS, preset_kwargs, summarize_batch, summarize_text
+
+
+def summarizer_throughput(texts, batch_size=8, **generate_kwargs):
+    """
+    Times the single-text and batched summarization paths on the same texts.
+    Returns texts per second for each path and the batched speedup.
+    """
+    texts = list(texts)
+    generate_kwargs.setdefault("use_cache", False)  # time generation, not the disk cache
+    summarize_text(texts[0], **generate_kwargs)  # load the model outside the timings
+
+    start = time.perf_counter()
+    for text in texts:
+        summarize_text(text, **generate_kwargs)
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    summarize_batch(texts, batch_size=batch_size, **generate_kwargs)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        "texts": len(texts),
+        "batch_size": batch_size,
+        "single_texts_per_sec": len(texts) / single_seconds,
+        "batch_texts_per_sec": len(texts) / batch_seconds,
+        "speedup": single_seconds / batch_seconds,
+    }
+
+
+def _ngrams(tokens, n):
+    return Counter(tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+
+def _lcs_length(a, b):
+    previous = [0] * (len(b) + 1)
+    for x in a:
+        current = [0]
+        for j, y in enumerate(b):
+            current.append(previous[j] + 1 if x == y else max(previous[j + 1], current[j]))
+        previous = current
+    return previous[-1]
+
+def _f1(overlap, candidate_total, reference_total):
+    if not overlap:
+        return 0.0
+    precision = overlap / candidate_total
+    recall = overlap / reference_total
+    return 2 * precision * recall / (precision + recall)
+
+def rouge(candidate, reference):
+    """
+    ROUGE-1, ROUGE-2 and ROUGE-L F1 on lowercased whitespace tokens.
+    """
+    cand, ref = candidate.lower().split(), reference.lower().split()
+    scores = {}
+    for n in (1, 2):
+        c, r = _ngrams(cand, n), _ngrams(ref, n)
+        scores[f"rouge{n}"] = _f1(sum((c & r).values()), sum(c.values()), sum(r.values()))
+    scores["rougeL"] = _f1(_lcs_length(cand, ref), len(cand), len(ref))
+    return scores
+
+def preset_drift(texts, presets=PRESETS, max_length=None, quantized=(False, True), reference=DEFAULT_PRESET):
+    """
+    Per-request latency of every preset (fp32 and int8) and ROUGE drift
+    against the fp32 output of the reference preset on the same texts.
+    Returns one row per (preset, quantized) combination.
+    """
+    texts = list(texts)
+    runs = {}
+    for q in quantized:
+        summarize_text(texts[0], use_cache=False, quantized=q)  # load the model outside the timings
+        for name in presets:
+            kwargs = preset_kwargs(name, max_length)
+            start = time.perf_counter()
+            outputs = [summarize_text(t, use_cache=False, quantized=q, **kwargs) for t in texts]
+            runs[name, q] = (outputs, (time.perf_counter() - start) / len(texts))
+
+    if (reference, False) not in runs:
+        raise ValueError(f"Reference preset {reference!r} must be run in fp32")
+    baseline = runs[reference, False][0]
+
+    rows = []
+    for (name, q), (outputs, seconds) in runs.items():
+        scores = [rouge(out, ref) for out, ref in zip(outputs, baseline)]
+        rows.append({
+            "preset": name,
+            "int8": q,
+            "seconds_per_text": seconds,
+            **{metric: sum(s[metric] for s in scores) / len(scores) for metric in scores[0]},
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    reviews = pd.read_csv("../data/raw/amazon_reviews_labeled.csv")["review"]
+    sample = (reviews.sample(64, random_state=42) + " ").str.repeat(4).tolist()
+    for size in (1, 4, 8, 16):
+        print(summarizer_throughput(sample, batch_size=size))
+
+    print(pd.DataFrame(preset_drift(reviews.sample(32, random_state=7))).to_string(index=False))
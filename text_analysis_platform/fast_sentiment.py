@@ -0,0 +1,136 @@
+import math
+import random
+import re
+from collections import Counter
+
+VERIFY_DOCS = 200
+VERIFY_TOLERANCE = 1e-9
+
+class CompiledSentiment:
+    """
+    TF-IDF + binary logistic regression folded into one table:
+    term -> (idf * coef, idf). Scoring a text is the vectorizer's own
+    analyzer, a dictionary lookup per term and a dot product, with no sparse
+    matrix or sklearn input validation in between. The idf column is kept
+    because the l2 norm depends on every term present in the text.
+    """
+
+    def __init__(self, terms, coef, idf, intercept, analyzer, binary=False, sublinear_tf=False, norm="l2"):
+        # idf is None when the vectorizer was fitted with use_idf=False
+        idf = [1.0] * len(terms) if idf is None else [float(v) for v in idf]
+        self.weights = {
+            term: (w * float(c), w)
+            for term, c, w in zip(terms, coef, idf)
+        }
+        self.intercept = float(intercept)
+        self.analyzer = analyzer
+        self.binary = binary
+        self.sublinear_tf = sublinear_tf
+        self.norm = norm
+
+    @classmethod
+    def from_models(cls, vectorizer, model):
+        terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+        return cls(
+            terms,
+            model.coef_[0],
+            vectorizer.idf_ if vectorizer.use_idf else None,
+            model.intercept_[0],
+            vectorizer.build_analyzer(),
+            vectorizer.binary,
+            vectorizer.sublinear_tf,
+            vectorizer.norm,
+        )
+
+    def predict_proba(self, text):
+        """
+        Returns (prob_neg, prob_pos) for one text, matching
+        model.predict_proba(vectorizer.transform([text]))[0].
+        """
+        dot, norm = 0.0, 0.0
+        for term, count in Counter(self.analyzer(text)).items():
+            entry = self.weights.get(term)
+            if entry is None:
+                continue
+            tf = 1.0 if self.binary else float(count)
+            if self.sublinear_tf:
+                tf = 1.0 + math.log(tf)
+            weight, idf = entry
+            dot += tf * weight
+            if self.norm == "l2":
+                norm += (tf * idf) ** 2
+            elif self.norm == "l1":
+                norm += abs(tf * idf)
+
+        if self.norm == "l2":
+            norm = math.sqrt(norm)
+        if self.norm and norm:
+            dot /= norm
+
+        z = dot + self.intercept
+        if z >= 0:
+            prob_pos = 1.0 / (1.0 + math.exp(-z))
+        else:
+            e = math.exp(z)
+            prob_pos = e / (1.0 + e)
+        return 1.0 - prob_pos, prob_pos
+
+    def max_error(self, vectorizer, model, texts):
+        """
+        Largest absolute difference from sklearn's predict_proba on texts.
+        """
+        expected = model.predict_proba(vectorizer.transform(texts))[:, 1]
+        return max(abs(self.predict_proba(t)[1] - p) for t, p in zip(texts, expected))
+
+def word_analyzer(token_pattern=r"(?u)\b\w\w+\b", lowercase=True, ngram_range=(1, 1), stop_words=None):
+    """
+    The analyzer TfidfVectorizer builds for analyzer="word" with no custom
+    preprocessor, tokenizer or accent stripping, without importing sklearn.
+    """
+    pattern = re.compile(token_pattern)
+    if pattern.groups > 1:
+        raise ValueError("token_pattern should have at most one capturing group")
+    min_n, max_n = ngram_range
+    stop_words = frozenset(stop_words or ())
+
+    def analyze(doc):
+        tokens = pattern.findall(doc.lower() if lowercase else doc)
+        if stop_words:
+            tokens = [w for w in tokens if w not in stop_words]
+        grams = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n, len(tokens)) + 1):
+            grams += [" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1)]
+        return grams
+
+    return analyze
+
+def probe_texts(vectorizer, n_docs=VERIFY_DOCS, terms_per_doc=20, seed=0):
+    """
+    Deterministic pseudo-documents built from the vectorizer's vocabulary,
+    with repeats so sublinear tf and n-gram terms are exercised.
+    """
+    rng = random.Random(seed)
+    words = sorted({w for term in vectorizer.vocabulary_ for w in term.split()})
+    docs = [" ".join(rng.choices(words, k=terms_per_doc)) for _ in range(n_docs)]
+    docs += [f"{d} {d.split()[0]}" for d in docs[:10]] + [""]
+    return docs
+
+def compile_sentiment(vectorizer, model, tolerance=VERIFY_TOLERANCE):
+    """
+    Compiles the fast path when the pipeline is a TF-IDF vectorizer plus a
+    binary logistic regression, and checks it against predict_proba on
+    probe texts. Returns None (callers keep using sklearn) when the models
+    do not fit that shape or the check fails.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+
+    if not isinstance(vectorizer, TfidfVectorizer) or not isinstance(model, LogisticRegression):
+        return None
+    if len(model.classes_) != 2 or vectorizer.norm not in ("l1", "l2", None):
+        return None
+
+    compiled = CompiledSentiment.from_models(vectorizer, model)
+    if compiled.max_error(vectorizer, model, probe_texts(vectorizer)) > tolerance:
+        return None
+    return compiled
@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from pipeline import Analyzer, load_artifacts, load_nlp
+from summarizer import load_bart_async, summarize_within
+from warmup import Warmup
+
+REQUEST_TIMEOUT = 30  # seconds, on top of any summarization budget
+ANALYZE_CHUNK = 256  # texts per /analyze request
+HEALTH_RETRY_SECONDS = 30  # while on the fallback, how often to look for the server again
+
+def start_local_warmup(quantized=False, imports=()):
+    """
+    Loads spaCy, the LDA/sentiment artifacts and BART on a background thread.
+    """
+    return Warmup(
+        {
+            "spaCy": load_nlp,
+            "LDA + sentiment": load_artifacts,
+            # Through load_bart_async, so summarize_within sees this load
+            "BART": lambda: load_bart_async(quantized).result(),
+        },
+        imports=imports,
+    ).start()
+
+class LocalBackend:
+    """
+    Runs every model in this process, as loaded by start_local_warmup.
+    """
+
+    def __init__(self, warmup, quantized=False):
+        self.warmup = warmup
+        self.default_quantized = quantized  # the BART variant the warm-up loads
+        self._analyzer = None
+        self._lock = threading.Lock()
+
+    def analyzer(self):
+        # Blocks only if the warm-up has not finished these yet
+        with self._lock:
+            if self._analyzer is None:
+                self._analyzer = Analyzer(self.warmup.get("spaCy"), self.warmup.get("LDA + sentiment"))
+        return self._analyzer
+
+    def analyze(self, texts):
+        return self.analyzer().analyze(list(texts))
+
+    def topic_keywords(self, topn=10):
+        return self.analyzer().topic_keywords(topn)
+
+    def summarize(self, text, budget_seconds, **summary_kwargs):
+        # summarize_within waits for the requested BART variant within the
+        # budget, and falls back (saying why) if it is not ready
+        return summarize_within(text, budget_seconds, **summary_kwargs)
+
+class ModelClient:
+    """
+    Thin JSON-over-HTTP client for model_server, with the same methods as
+    LocalBackend. If the server refuses the connection (it is not running),
+    fallback() is called once to build an in-process backend, and calls go
+    there until a /health probe, made every HEALTH_RETRY_SECONDS, finds the
+    server again. Timeouts and other errors fail only the call that hit
+    them.
+    """
+
+    def __init__(self, url, fallback=None, timeout=REQUEST_TIMEOUT):
+        self.url = url.rstrip("/")
+        self.fallback = fallback
+        self.timeout = timeout
+        self.local = None
+        self.default_quantized = False  # the server's BART variant, from /health
+        self._probed_at = 0.0
+        self._lock = threading.Lock()
+
+    def _request(self, path, payload=None, timeout=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(
+            self.url + path,
+            data=data,
+            headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout or self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            # The server is up but the request failed; falling back would
+            # most likely fail the same way
+            raise RuntimeError(f"Model server error: {e.read().decode('utf-8', errors='ignore')}")
+
+    def _use_server(self):
+        if self.local is None:
+            return True
+        with self._lock:
+            if time.monotonic() - self._probed_at < HEALTH_RETRY_SECONDS:
+                return False
+            self._probed_at = time.monotonic()
+        return self.health()
+
+    def _call(self, local_call, path, payload=None, unpack=None, timeout=None):
+        if self._use_server():
+            try:
+                result = self._request(path, payload, timeout)
+                return unpack(result) if unpack else result
+            except (urllib.error.URLError, ConnectionError) as e:
+                refused = isinstance(getattr(e, "reason", e), ConnectionRefusedError)
+                if self.fallback is None or not refused:
+                    raise
+                with self._lock:
+                    if self.local is None:
+                        self.local = self.fallback()
+                    self._probed_at = time.monotonic()
+        return local_call(self.local)
+
+    def health(self):
+        try:
+            body = self._request("/health", timeout=2)
+        except (urllib.error.URLError, ConnectionError, TimeoutError, RuntimeError, ValueError):
+            return False
+        self.default_quantized = bool(body.get("quantized", False))
+        return body.get("status") == "ok"
+
+    def analyze(self, texts):
+        # In chunks, so a whole dataset never has to fit in one request and
+        # one request timeout
+        texts = list(texts)
+        results = []
+        for start in range(0, len(texts), ANALYZE_CHUNK):
+            chunk = texts[start:start + ANALYZE_CHUNK]
+            results += self._call(
+                lambda local, chunk=chunk: local.analyze(chunk),
+                "/analyze",
+                {"texts": chunk},
+                unpack=lambda r: r["results"]
+            )
+        return results
+
+    def topic_keywords(self, topn=10):
+        return self._call(
+            lambda local: local.topic_keywords(topn),
+            f"/topics?topn={int(topn)}",
+            unpack=lambda r: r["topics"]
+        )
+
+    def summarize(self, text, budget_seconds, **summary_kwargs):
+        return self._call(
+            lambda local: local.summarize(text, budget_seconds, **summary_kwargs),
+            "/summarize",
+            {"text": text, "budget_seconds": budget_seconds, "kwargs": summary_kwargs},
+            unpack=lambda r: (r["summary"], r["report"]),
+            timeout=self.timeout + max(budget_seconds, 0)
+        )
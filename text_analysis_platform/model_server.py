@@ -0,0 +1,255 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from model_client import start_local_warmup
+from pipeline import Analyzer
+from summarizer import CHUNK_TOKENS, DeadlineExceeded, load_bart_async, sanitize_text, summarize_batch, summarize_within
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+BATCH_WINDOW = 0.010  # seconds a batch stays open after its first request
+MAX_BATCH = 64  # requests per batch
+SUMMARY_WORKERS = 2  # threads for summaries that cannot join a batch
+
+def _copy_outcome(source, target):
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+class MicroBatcher:
+    """
+    Collects requests submitted from many threads and passes them to
+    process(items) -> results in batches, on one worker thread. A batch
+    closes when max_batch requests have arrived or `window` seconds after
+    its first request. submit() returns a Future for that request's result.
+    In place of a result, process may return an exception to fail just that
+    request, or a Future to finish it later off the worker thread.
+    """
+
+    def __init__(self, process, window=BATCH_WINDOW, max_batch=MAX_BATCH):
+        self.process = process
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.requests = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            closes_at = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = closes_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self.batches += 1
+            self.requests += len(batch)
+            try:
+                results = self.process([item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, Future):
+                    result.add_done_callback(lambda done, future=future: _copy_outcome(done, future))
+                elif isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+class ModelServer:
+    """
+    One copy of every model for all clients on the node. Concurrent
+    /analyze requests are scored together (one spaCy pass, one
+    predict_proba, one LDA inference call); concurrent /summarize requests
+    with the same generation settings share summarize_batch calls.
+    quantized is the BART variant used when a request does not name one.
+    """
+
+    def __init__(self, analyzer, window=BATCH_WINDOW, max_batch=MAX_BATCH, quantized=False, workers=SUMMARY_WORKERS):
+        self.analyzer = analyzer
+        self.quantized = quantized
+        self.analyze_batcher = MicroBatcher(self._analyze_batch, window, max_batch)
+        self.summary_batcher = MicroBatcher(self._summarize_batch, window, max_batch)
+        self.summary_pool = ThreadPoolExecutor(workers, thread_name_prefix="summarize")
+
+    def stats(self):
+        return {
+            name: {"requests": b.requests, "batches": b.batches}
+            for name, b in (("analyze", self.analyze_batcher), ("summarize", self.summary_batcher))
+        }
+
+    def _analyze_batch(self, requests):
+        try:
+            results = self.analyzer.analyze([text for texts in requests for text in texts])
+        except Exception:
+            # Find the request that broke the batch; the others still succeed
+            return [self._analyze_one(texts) for texts in requests]
+        out, start = [], 0
+        for texts in requests:
+            out.append(results[start:start + len(texts)])
+            start += len(texts)
+        return out
+
+    def _analyze_one(self, texts):
+        try:
+            return self.analyzer.analyze(texts)
+        except Exception as e:
+            return e
+
+    def _summarize_batch(self, requests):
+        # requests: (text, deadline, generation kwargs as a sorted tuple)
+        results = [None] * len(requests)
+        groups = defaultdict(list)
+        for i, (_, _, kwargs) in enumerate(requests):
+            groups[kwargs].append(i)
+
+        for kwargs, idx in groups.items():
+            try:
+                self._summarize_group(requests, idx, dict(kwargs), results)
+            except Exception as e:
+                # e.g. an unknown generation setting; fails only this group
+                for i in idx:
+                    if results[i] is None:
+                        results[i] = e
+        return results
+
+    def _summarize_group(self, requests, idx, summary_kwargs, results):
+        # Texts that fit in one chunk are batched here, if their BART variant
+        # is loaded. Everything else (long texts, a variant still loading, a
+        # batch that missed its deadline) goes to summarize_within on the
+        # pool, so it never holds up the batcher thread
+        load = load_bart_async(summary_kwargs.get("quantized", False))
+        short = []
+        if load.done() and load.exception() is None:
+            tokenizer, _, _ = load.result()
+            lengths = tokenizer([sanitize_text(requests[i][0]) for i in idx], add_special_tokens=False)["input_ids"]
+            short = [i for i, ids in zip(idx, lengths) if len(ids) <= CHUNK_TOKENS]
+
+        if short:
+            start = time.perf_counter()
+            try:
+                summaries = summarize_batch(
+                    [requests[i][0] for i in short],
+                    deadline=min(requests[i][1] for i in short),
+                    **summary_kwargs
+                )
+                report = {"method": "bart", "levels": [{"chunks": len(short), "seconds": time.perf_counter() - start}]}
+                for i, summary in zip(short, summaries):
+                    results[i] = (summary, report)
+            except DeadlineExceeded:
+                pass  # retried one by one below, each within its own budget
+
+        for i in idx:
+            if results[i] is None:
+                text, deadline, _ = requests[i]
+                results[i] = self.summary_pool.submit(self._summarize_one, text, deadline, summary_kwargs)
+
+    def _summarize_one(self, text, deadline, summary_kwargs):
+        # Time spent queued for the pool counts against the budget
+        return summarize_within(text, deadline - time.monotonic(), **summary_kwargs)
+
+class BatchingHTTPServer(ThreadingHTTPServer):
+    # Many clients connect at once by design; the default listen backlog
+    # of 5 would reset the rest
+    request_queue_size = 128
+    daemon_threads = True
+
+def make_handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/health":
+                self._send(200, {"status": "ok", "quantized": server.quantized, "batches": server.stats()})
+            elif url.path == "/topics":
+                try:
+                    topn = int(parse_qs(url.query).get("topn", ["10"])[0])
+                    topics = server.analyzer.topic_keywords(topn)
+                except ValueError as e:
+                    # Also raised when a bundle keeps fewer keywords than asked
+                    self._send(400, {"error": f"Bad request: {e}"})
+                    return
+                self._send(200, {"topics": topics})
+            else:
+                self._send(404, {"error": f"Unknown path {url.path}"})
+
+        def do_POST(self):
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                if self.path == "/analyze":
+                    item, batcher = [str(t) for t in payload["texts"]], server.analyze_batcher
+                elif self.path == "/summarize":
+                    deadline = time.monotonic() + float(payload["budget_seconds"])
+                    kwargs = {"quantized": server.quantized, **payload.get("kwargs", {})}
+                    kwargs = tuple(sorted(kwargs.items()))
+                    item, batcher = (str(payload["text"]), deadline, kwargs), server.summary_batcher
+                else:
+                    self._send(404, {"error": f"Unknown path {self.path}"})
+                    return
+            except (KeyError, TypeError, ValueError) as e:
+                self._send(400, {"error": f"Bad request: {e}"})
+                return
+
+            try:
+                result = batcher.submit(item).result()
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+                return
+
+            if self.path == "/analyze":
+                self._send(200, {"results": result})
+            else:
+                summary, report = result
+                self._send(200, {"summary": summary, "report": report})
+
+        def log_message(self, format, *args):
+            pass  # one line per request is too noisy at batch rates
+
+    return Handler
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, window=BATCH_WINDOW, max_batch=MAX_BATCH, quantized=False):
+    warmup = start_local_warmup(quantized)
+    analyzer = Analyzer(warmup.get("spaCy"), warmup.get("LDA + sentiment"))
+    warmup.get("BART")
+    httpd = BatchingHTTPServer((host, port), make_handler(ModelServer(analyzer, window, max_batch, quantized)))
+    print(f"Model server listening on http://{host}:{port}")
+    httpd.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared model server for the text analysis app")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--window-ms", type=float, default=BATCH_WINDOW * 1000, help="micro-batch window")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="requests per micro-batch")
+    parser.add_argument("--quantized", action="store_true", help="use the int8 BART model unless a request asks otherwise")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.window_ms / 1000, args.max_batch, args.quantized)
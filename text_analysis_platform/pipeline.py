@@ -0,0 +1,225 @@
+import os
+import re
+import pickle
+from functools import lru_cache
+
+from fast_sentiment import compile_sentiment
+
+# ----- PATHS -----
+BASE_DIR = "saved_models"
+LDA_PATH = os.path.join(BASE_DIR, "ldaModel.gensim")
+DICT_PATH = os.path.join(BASE_DIR, "ldaDictionary.gensim")
+PHRASERS_PATH = os.path.join(BASE_DIR, "Phrasers.pkl")
+SENTIMENT_MODEL_PATH = os.path.join(BASE_DIR, "sentiment_model.pkl")
+VECTORIZER_PATH = os.path.join(BASE_DIR, "tfidf_vectorizer.pkl")
+SOURCE_PATHS = (LDA_PATH, DICT_PATH, PHRASERS_PATH, SENTIMENT_MODEL_PATH, VECTORIZER_PATH)
+# Built from the files above by `python artifact_bundle.py`
+BUNDLE_DIR = os.path.join(BASE_DIR, "bundle")
+
+# ----- SPACY -----
+SPACY_BATCH_SIZE = 64
+# Worker processes per nlp.pipe call. The app and model_server are
+# multi-threaded with torch loaded, where forking on every call is slow and
+# can hang, so this is opt-in for large offline batches
+SPACY_N_PROCESS = int(os.environ.get("SPACY_N_PROCESS", 1))
+TOPIC_POSTAGS = ("NOUN", "ADJ", "VERB", "ADV")
+
+# ----- BATCHED INFERENCE -----
+LDA_BATCH_SIZE = 2000
+
+preserve_words = {
+    "no","not","never","none","nobody","nothing","neither","nor",
+    "very","too","so","such","just","only","really","even",
+    "but","yet","though","although","while",
+    "hardly","barely","scarcely"
+}
+
+# ----- LOAD RESOURCES -----
+@lru_cache(maxsize=1)
+def load_stop_words():
+    # Importing nltk takes over a second, so it is paid for on first use
+    # rather than when the app imports this module
+    from nltk.corpus import stopwords
+
+    return frozenset(stopwords.words("english"))
+
+def load_nlp():
+    import spacy
+
+    # Both token filters need the stop words; loading them here fails the
+    # spaCy warm-up task instead of the whole app when they are missing
+    load_stop_words()
+    # Only lemmas and POS tags are used; the tagger, attribute ruler and
+    # lemmatizer provide them without the parser or NER
+    return spacy.load("en_core_web_sm", disable=["parser", "ner"])
+
+def load_artifacts():
+    """
+    The compiled bundle when it is present and was built from the saved
+    models as they are now, otherwise the saved models themselves.
+    """
+    from artifact_bundle import bundle_is_current, load_bundle
+
+    if bundle_is_current(BUNDLE_DIR, SOURCE_PATHS):
+        try:
+            return load_bundle(BUNDLE_DIR)
+        except (OSError, KeyError, ValueError):
+            pass  # unreadable bundle; the saved models still work
+    return load_pickled_artifacts()
+
+def load_pickled_artifacts():
+    from gensim.models import LdaModel
+    from gensim.corpora import Dictionary
+
+    try:
+        lda = LdaModel.load(LDA_PATH)
+        id2word = Dictionary.load(DICT_PATH)
+    except Exception as e:
+        raise RuntimeError(f"Failed to load LDA or Dictionary: {e}")
+
+    try:
+        with open(PHRASERS_PATH, "rb") as f:
+            ph = pickle.load(f)
+        bigram_mod, trigram_mod = ph.get("bigram_mod"), ph.get("trigram_mod")
+        if bigram_mod is None or trigram_mod is None:
+            raise ValueError("Phrasers.pkl missing 'bigram_mod' or 'trigram_mod' keys.")
+    except Exception as e:
+        raise RuntimeError(f"Failed to load phrasers: {e}")
+
+    try:
+        with open(SENTIMENT_MODEL_PATH, "rb") as f:
+            sentiment_model = pickle.load(f)
+        with open(VECTORIZER_PATH, "rb") as f:
+            vectorizer = pickle.load(f)
+    except Exception as e:
+        raise RuntimeError(f"Failed to load sentiment model/vectorizer: {e}")
+
+    # Verified against predict_proba on probe texts; None means the model is
+    # not a binary linear TF-IDF pipeline and sklearn is used as before
+    fast_sentiment = compile_sentiment(vectorizer, sentiment_model)
+
+    return lda, id2word, bigram_mod, trigram_mod, sentiment_model, vectorizer, fast_sentiment
+
+# ----- TEXT PROCESSING -----
+def clean_text(text):
+    # Keep only letters, collapse whitespace, lowercase
+    text = re.sub(r"<.*?>", " ", str(text))
+    text = re.sub(r"[^a-zA-Z]", " ", text)
+    text = re.sub(r"\s+", " ", text).strip().lower()
+    return text
+
+def build_phrases(tokens_list, bigram_model, trigram_model):
+    # Apply bigram then trigram
+    bigrammed = [bigram_model[doc] for doc in tokens_list]
+    trigrammed = [trigram_model[doc] for doc in bigrammed]
+    return trigrammed
+
+def sentiment_tokens(doc):
+    # Lemmas of every token except stop words, keeping negations/intensifiers
+    stop_words = load_stop_words()
+    return " ".join(
+        token.lemma_ for token in doc
+        if token.text not in stop_words or token.text in preserve_words
+    )
+
+def topic_tokens(doc, bigram_model, trigram_model, allowed_postags=TOPIC_POSTAGS, min_len=3, max_len=15):
+    # Same token filter as the training pipeline, then bigram/trigram phrases.
+    # Single words become their lemma when their POS is allowed; a phrase is
+    # kept as-is when its last word (the head of the compound) is allowed
+    stop_words = load_stop_words()
+    kept = [token for token in doc if min_len <= len(token.text) <= max_len and token.text not in stop_words]
+    phrased = build_phrases([[token.text for token in kept]], bigram_model, trigram_model)[0]
+
+    out, i = [], 0
+    for tok in phrased:
+        n = tok.count("_") + 1  # clean_text leaves no underscores of its own
+        head = kept[i + n - 1]
+        if head.pos_ in allowed_postags:
+            out.append(head.lemma_ if n == 1 else tok)
+        i += n
+    return out
+
+class Analyzer:
+    """
+    Sentiment and topic inference with spaCy and the load_artifacts models.
+    Keeps no per-request state, so one instance can serve every session of
+    the app, or every client of model_server.
+    """
+
+    def __init__(self, nlp, artifacts):
+        self.nlp = nlp
+        (self.lda_model, self.dictionary, self.bigram_model, self.trigram_model,
+         self.sentiment_model, self.vectorizer, self.fast_sentiment) = artifacts
+        self._keywords = {}
+
+    def parse_texts(self, texts, batch_size=SPACY_BATCH_SIZE, n_process=None):
+        """
+        texts: list of raw strings
+        returns: (sentiment_texts, lemmatized) from one spaCy pass per doc,
+        the first for the TF-IDF vectorizer and the second for LDA;
+        n_process defaults to SPACY_N_PROCESS
+        """
+        # Worker start-up costs more than it saves on a handful of docs
+        n_process = SPACY_N_PROCESS if n_process is None else n_process
+        n_process = max(1, min(n_process, len(texts) // batch_size))
+
+        sentiment_texts, lemmatized = [], []
+        for doc in self.nlp.pipe((clean_text(t) for t in texts), batch_size=batch_size, n_process=n_process):
+            sentiment_texts.append(sentiment_tokens(doc))
+            lemmatized.append(topic_tokens(doc, self.bigram_model, self.trigram_model))
+        return sentiment_texts, lemmatized
+
+    def sentiment_probs(self, sentiment_texts):
+        """
+        returns: (n_docs, 2) array of [prob_neg, prob_pos]; a single text
+        goes through the compiled fast path when there is one, and so does
+        every text when the artifacts came from the bundle (no sklearn model)
+        """
+        import numpy as np
+
+        if self.fast_sentiment is not None and (len(sentiment_texts) == 1 or self.sentiment_model is None):
+            return np.array([self.fast_sentiment.predict_proba(t) for t in sentiment_texts]).reshape(-1, 2)
+        return self.sentiment_model.predict_proba(self.vectorizer.transform(sentiment_texts))
+
+    def topic_matrix(self, lemmatized, batch_size=LDA_BATCH_SIZE):
+        """
+        lemmatized: list of topic token lists from parse_texts
+        returns: (n_docs, num_topics) array of topic probabilities, computed
+        with one variational inference call per batch of documents
+        """
+        import numpy as np
+
+        bows = [self.dictionary.doc2bow(doc) for doc in lemmatized]
+        dists = np.empty((len(bows), self.lda_model.num_topics))
+        for start in range(0, len(bows), batch_size):
+            gamma, _ = self.lda_model.inference(bows[start:start + batch_size])
+            # Same normalisation get_document_topics applies to a single doc
+            dists[start:start + batch_size] = gamma / gamma.sum(axis=1, keepdims=True)
+        return dists
+
+    def analyze(self, texts, n_process=None):
+        """
+        texts: list of raw strings
+        returns: one {"prob_neg", "prob_pos", "topic_dist"} dict per text,
+        with plain floats so results can be sent as JSON
+        """
+        if not texts:
+            return []
+        sentiment_texts, lemmatized = self.parse_texts(texts, n_process=n_process)
+        probs = self.sentiment_probs(sentiment_texts)
+        dists = self.topic_matrix(lemmatized)
+        return [
+            {"prob_neg": float(p[0]), "prob_pos": float(p[1]), "topic_dist": d.tolist()}
+            for p, d in zip(probs, dists)
+        ]
+
+    def topic_keywords(self, topn=10):
+        """
+        returns: list indexed by topic id of [(word, prob), ...], best first
+        """
+        if topn not in self._keywords:
+            self._keywords[topn] = [
+                [(word, float(prob)) for word, prob in self.lda_model.show_topic(tid, topn=topn)]
+                for tid in range(self.lda_model.num_topics)
+            ]
+        return self._keywords[topn]
@@ -1,21 +1,101 @@
-import torch
+import os
 import re
-from transformers import BartForConditionalGeneration, BartTokenizer
+import threading
+import time
+from concurrent.futures import Future
 from functools import lru_cache
 
+import summary_cache
+
 MODEL_NAME = "facebook/bart-large-cnn"
 MAX_INPUT_TOKENS = 1024  # BART encoder limit
+MIN_INPUT_CHARS = 20
+TOO_SHORT_MESSAGE = "Text too short to summarize."
+CHUNK_TOKENS = MAX_INPUT_TOKENS - 2  # room for <s> and </s>
+MAX_LEVELS = 5
+NUM_THREADS = int(os.environ.get("SUMMARIZER_NUM_THREADS", "0")) or None  # None keeps torch's default
+
+# Quality/latency presets; max_length can be overridden per call
+PRESETS = {
+    "greedy": {"num_beams": 1, "max_length": 50},
+    "beams-2": {"num_beams": 2, "max_length": 50},
+    "beams-4": {"num_beams": 4, "max_length": 50},
+}
+DEFAULT_PRESET = "beams-4"
+FALLBACK_SENTENCES = 3
+BART_RETRY_SECONDS = 60  # a failed load is not retried for this long
+
+# Background loads per variant (quantized -> (Future, start time))
+_bart_loads = {}
+_bart_lock = threading.Lock()
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+def preset_kwargs(name, max_length=None):
+    """
+    Generation kwargs for a named preset, e.g. summarize_text(text, **preset_kwargs("greedy", max_length=90)).
+    """
+    if name not in PRESETS:
+        raise ValueError(f"Unknown summarizer preset {name!r}; choose from {sorted(PRESETS)}")
+    kwargs = dict(PRESETS[name])
+    if max_length is not None:
+        kwargs["max_length"] = max_length
+    return kwargs
+
+@lru_cache(maxsize=2)
+def load_bart_model(quantized=False, num_threads=NUM_THREADS):
+    """
+    Loads BART on CPU. quantized=True swaps every nn.Linear for a dynamically
+    quantized int8 version (weights int8, activations quantized on the fly),
+    which cuts CPU generation time at a small quality cost.
+    num_threads sets torch's intra-op thread count for the whole process.
+    torch and transformers are imported here rather than at module level so
+    importing this module (e.g. for PRESETS) stays cheap.
+    """
+    import torch
+    from transformers import BartForConditionalGeneration, BartTokenizer
+
+    if num_threads:
+        torch.set_num_threads(num_threads)
 
-@lru_cache(maxsize=1)
-def load_bart_model():
     tokenizer = BartTokenizer.from_pretrained(MODEL_NAME)
     model = BartForConditionalGeneration.from_pretrained(MODEL_NAME)
     device = "cpu"
 
     model.to(device)
     model.eval()  # set to eval mode for generation
+    if quantized:
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
     return tokenizer, model, device
 
+def load_bart_async(quantized=False):
+    """
+    Starts load_bart_model(quantized) on a background thread, once, and
+    returns a Future for its result. A failed load is kept for
+    BART_RETRY_SECONDS after it started before the next call tries again,
+    so a missing model does not cost a from_pretrained attempt per request.
+    """
+    with _bart_lock:
+        entry = _bart_loads.get(quantized)
+        if entry is not None:
+            future, started = entry
+            retry = future.done() and future.exception() is not None and time.monotonic() - started >= BART_RETRY_SECONDS
+            if not retry:
+                return future
+
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(load_bart_model(quantized))
+            except Exception as e:
+                future.set_exception(e)
+
+        _bart_loads[quantized] = (future, time.monotonic())
+        threading.Thread(target=run, name="bart-load-int8" if quantized else "bart-load", daemon=True).start()
+        return future
+
 def sanitize_text(text):
     if not isinstance(text, str):
         text = str(text) if text is not None else ""
@@ -23,14 +103,54 @@ def sanitize_text(text):
     cleaned = " ".join(text.strip().split())
     return cleaned
 
-def summarize_text(text, min_length=20, max_length=50, num_beams=4, length_penalty=1.5, no_repeat_ngram_size=3, seed=None):
-    tokenizer, model, device = load_bart_model()
-    if seed is not None:
-        torch.manual_seed(seed)
+def _cache_key(text, min_length, max_length, num_beams, length_penalty, no_repeat_ngram_size, quantized=False):
+    return summary_cache.summary_key(
+        text,
+        f"{MODEL_NAME}:int8" if quantized else MODEL_NAME,
+        min_length=min_length,
+        max_length=max_length,
+        num_beams=num_beams,
+        length_penalty=length_penalty,
+        no_repeat_ngram_size=no_repeat_ngram_size
+    )
+
+def _generate(model, deadline=None, **generate_kwargs):
+    """
+    model.generate with an optional deadline (a time.monotonic() value).
+    Generation is stopped cooperatively through max_time; an output cut short
+    by it is incomplete, so DeadlineExceeded is raised instead of returning it.
+    """
+    import torch
+
+    if deadline is not None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("Summarization deadline passed before generation started.")
+        generate_kwargs["max_time"] = remaining
 
+    with torch.inference_mode():
+        output = model.generate(**generate_kwargs)
+
+    if deadline is not None and time.monotonic() >= deadline:
+        raise DeadlineExceeded("BART generation did not finish before the deadline.")
+    return output
+
+def summarize_text(text, min_length=20, max_length=50, num_beams=4, length_penalty=1.5, no_repeat_ngram_size=3, seed=None, use_cache=True, quantized=False, deadline=None):
     text = sanitize_text(text)
-    if not text or len(text) < 20:
-        return "Text too short to summarize."
+    if not text or len(text) < MIN_INPUT_CHARS:
+        return TOO_SHORT_MESSAGE
+
+    if use_cache:
+        key = _cache_key(text, min_length, max_length, num_beams, length_penalty, no_repeat_ngram_size, quantized)
+        cached = summary_cache.get(key)
+        if cached is not None:
+            return cached
+
+    import torch
+
+    tokenizer, model, device = load_bart_model(quantized)
+    if seed is not None:
+        torch.manual_seed(seed)
 
     inputs = tokenizer(
         [text], 
@@ -44,10 +164,77 @@ def summarize_text(text, min_length=20, max_length=50, num_beams=4, length_penal
         attention_mask = attention_mask.to(device)
 
     # Generate Summary
-    with torch.inference_mode():
-        summary_ids = model.generate(
-            input_ids=input_ids,
-            attention_mask=attention_mask,
+    summary_ids = _generate(
+        model,
+        deadline,
+        input_ids=input_ids,
+        attention_mask=attention_mask,
+        num_beams=num_beams,
+        min_length=min_length,
+        max_length=max_length,
+        length_penalty=length_penalty,
+        early_stopping=True,
+        no_repeat_ngram_size=no_repeat_ngram_size
+    )
+    
+    summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+    if use_cache:
+        summary_cache.put(key, summary)
+    return summary
+
+def summarize_batch(texts, batch_size=8, min_length=20, max_length=50, num_beams=4, length_penalty=1.5, no_repeat_ngram_size=3, seed=None, use_cache=True, quantized=False, deadline=None):
+    """
+    Summarizes many texts with one model.generate call per batch.
+    Inputs are bucketed by token length so each batch is padded only to its
+    own longest member. Returns summaries in input order; texts too short to
+    summarize get TOO_SHORT_MESSAGE, as with summarize_text.
+    Cached summaries are reused and only the misses are generated.
+    """
+    cleaned = [sanitize_text(t) for t in texts]
+    results = [TOO_SHORT_MESSAGE] * len(cleaned)
+    todo = [i for i, t in enumerate(cleaned) if t and len(t) >= MIN_INPUT_CHARS]
+
+    keys = {}
+    if use_cache:
+        misses = []
+        for i in todo:
+            keys[i] = _cache_key(cleaned[i], min_length, max_length, num_beams, length_penalty, no_repeat_ngram_size, quantized)
+            cached = summary_cache.get(keys[i])
+            if cached is None:
+                misses.append(i)
+            else:
+                results[i] = cached
+        todo = misses
+    if not todo:
+        return results
+
+    import torch
+
+    tokenizer, model, device = load_bart_model(quantized)
+    if seed is not None:
+        torch.manual_seed(seed)
+
+    # Tokenize once without padding to learn each input's length
+    encoded = tokenizer(
+        [cleaned[i] for i in todo],
+        max_length=MAX_INPUT_TOKENS,
+        truncation=True
+    )["input_ids"]
+    order = sorted(range(len(todo)), key=lambda k: len(encoded[k]))
+
+    for start in range(0, len(order), batch_size):
+        bucket = order[start:start + batch_size]
+        inputs = tokenizer.pad(
+            {"input_ids": [encoded[k] for k in bucket]},
+            padding="longest",
+            return_tensors="pt"
+        )
+
+        summary_ids = _generate(
+            model,
+            deadline,
+            input_ids=inputs["input_ids"].to(device),
+            attention_mask=inputs["attention_mask"].to(device),
             num_beams=num_beams,
             min_length=min_length,
             max_length=max_length,
@@ -55,6 +242,157 @@ def summarize_text(text, min_length=20, max_length=50, num_beams=4, length_penal
             early_stopping=True,
             no_repeat_ngram_size=no_repeat_ngram_size
         )
-    
-    summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-    return summary
+
+        summaries = tokenizer.batch_decode(summary_ids, skip_special_tokens=True)
+        for k, summary in zip(bucket, summaries):
+            results[todo[k]] = summary
+            if use_cache:
+                summary_cache.put(keys[todo[k]], summary)
+
+    return results
+
+def split_sentences(text):
+    """
+    Splits raw text into sanitized sentences. Blank lines (how read_file
+    joins CSV rows) count as boundaries too, since sanitize_text would
+    otherwise merge unpunctuated rows.
+    """
+    pieces = []
+    for block in re.split(r"\n\s*\n", text if isinstance(text, str) else sanitize_text(text)):
+        for sentence in re.split(r"(?<=[.!?])\s+", block):
+            sentence = sanitize_text(sentence)
+            if sentence:
+                pieces.append(sentence)
+    return pieces
+
+def chunk_sentences(sentences, tokenizer, chunk_tokens=CHUNK_TOKENS):
+    """
+    Greedily packs consecutive sentences into chunks of at most chunk_tokens
+    tokens. A single sentence longer than that is split on token windows.
+    """
+    lengths = [len(ids) for ids in tokenizer(sentences, add_special_tokens=False)["input_ids"]] if sentences else []
+    chunks, current, current_len = [], [], 0
+
+    for sentence, length in zip(sentences, lengths):
+        if length > chunk_tokens:
+            if current:
+                chunks.append(" ".join(current))
+                current, current_len = [], 0
+            ids = tokenizer(sentence, add_special_tokens=False)["input_ids"]
+            for start in range(0, len(ids), chunk_tokens):
+                chunks.append(tokenizer.decode(ids[start:start + chunk_tokens]))
+            continue
+
+        if current and current_len + length > chunk_tokens:
+            chunks.append(" ".join(current))
+            current, current_len = [], 0
+        current.append(sentence)
+        current_len += length
+
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+def summarize_long(text, min_length=20, max_length=50, num_beams=4, length_penalty=1.5, no_repeat_ngram_size=3, seed=None,
+                   chunk_tokens=CHUNK_TOKENS, batch_size=8, max_levels=MAX_LEVELS, use_cache=True, quantized=False, deadline=None):
+    """
+    Hierarchical (map-reduce) summarization for inputs longer than the BART
+    encoder limit, instead of silently truncating them.
+    The text is split on sentence boundaries into token-bounded chunks, the
+    chunks are summarized in batches, and the joined partial summaries are
+    summarized again until they fit into a single chunk.
+    Returns (summary, report) where report lists the chunk count and
+    seconds spent at each level.
+    """
+    tokenizer, _, _ = load_bart_model(quantized)
+    generate_kwargs = dict(
+        min_length=min_length,
+        max_length=max_length,
+        num_beams=num_beams,
+        length_penalty=length_penalty,
+        no_repeat_ngram_size=no_repeat_ngram_size,
+        seed=seed,
+        use_cache=use_cache,
+        quantized=quantized,
+        deadline=deadline
+    )
+    report = {"levels": []}
+
+    chunks = chunk_sentences(split_sentences(text), tokenizer, chunk_tokens)
+    while len(chunks) > 1 and len(report["levels"]) < max_levels:
+        start = time.perf_counter()
+        partials = summarize_batch(chunks, batch_size=batch_size, **generate_kwargs)
+        partials = [p for p in partials if p != TOO_SHORT_MESSAGE]
+        report["levels"].append({"chunks": len(chunks), "seconds": time.perf_counter() - start})
+        chunks = chunk_sentences(partials, tokenizer, chunk_tokens)
+
+    start = time.perf_counter()
+    summary = summarize_text(" ".join(chunks), **generate_kwargs)
+    report["levels"].append({"chunks": 1, "seconds": time.perf_counter() - start})
+    return summary, report
+
+def extractive_summary(text, n_sentences=FALLBACK_SENTENCES):
+    """
+    Fast extractive summary: the n sentences closest to the TF-IDF centroid
+    of the text (the approach src/summarization.py takes for whole reviews),
+    in their original order. Runs in milliseconds even on whole uploads.
+    """
+    import numpy as np
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    sentences = list(dict.fromkeys(split_sentences(text)))
+    if not sentences:
+        return TOO_SHORT_MESSAGE
+    if len(sentences) <= n_sentences:
+        return " ".join(sentences)
+
+    try:
+        vectors = TfidfVectorizer(stop_words="english").fit_transform(sentences)
+    except ValueError:  # nothing but stop words
+        return " ".join(sentences[:n_sentences])
+
+    centroid = np.asarray(vectors.mean(axis=0)).ravel()
+    scores = vectors @ centroid
+    best = np.sort(np.argpartition(-scores, n_sentences)[:n_sentences])
+    return " ".join(sentences[i] for i in best)
+
+def summarize_within(text, budget_seconds, fallback_sentences=FALLBACK_SENTENCES, **summary_kwargs):
+    """
+    summarize_long bounded by a latency budget, which covers loading the
+    requested BART variant as well as generating. A load still running when
+    the budget runs out carries on in the background for later calls; a
+    failed load falls back at once. Either way, and whenever generation
+    cannot finish in time, an extractive summary is returned instead.
+    Returns (summary, report); report["method"] is "bart" or "extractive",
+    and an extractive report carries the "reason" for the fallback.
+    """
+    deadline = time.monotonic() + budget_seconds
+    variant = "BART (int8)" if summary_kwargs.get("quantized") else "BART"
+    reason = None
+    try:
+        load_bart_async(summary_kwargs.get("quantized", False)).result(timeout=max(budget_seconds, 0))
+    except TimeoutError:
+        reason = f"{variant} is still loading"
+    except Exception as e:
+        reason = f"{variant} unavailable: {e}"
+
+    if reason is None and time.monotonic() >= deadline:
+        reason = "no time left in the latency budget"
+    if reason is None:
+        try:
+            summary, report = summarize_long(text, deadline=deadline, **summary_kwargs)
+            report["method"] = "bart"
+            return summary, report
+        except DeadlineExceeded:
+            reason = f"{variant} did not finish within {budget_seconds:g}s"
+        except (OSError, RuntimeError, ImportError) as e:
+            reason = f"{variant} unavailable: {e}"
+
+    fallback_start = time.perf_counter()
+    summary = extractive_summary(text, fallback_sentences)
+    report = {
+        "method": "extractive",
+        "reason": reason,
+        "levels": [{"chunks": 1, "seconds": time.perf_counter() - fallback_start}]
+    }
+    return summary, report
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+CACHE_DIR = os.path.join("cache", "summaries")
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+def cache_stats():
+    """
+    Hit/miss counters for this process (each Streamlit worker keeps its own).
+    """
+    with _lock:
+        stats = dict(_stats)
+    total = stats["hits"] + stats["misses"]
+    return {**stats, "hit_rate": stats["hits"] / total if total else 0.0}
+
+def summary_key(text, model_name, **params):
+    """
+    Content address for a summary: the sanitized text, the model and every
+    generation parameter that changes the output.
+    """
+    digest = hashlib.sha256()
+    digest.update(text.encode("utf-8"))
+    digest.update(json.dumps({"model": model_name, **params}, sort_keys=True).encode())
+    return digest.hexdigest()
+
+def get(key, cache_dir=CACHE_DIR):
+    path = os.path.join(cache_dir, f"{key}.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            summary = json.load(f)["summary"]
+        os.utime(path)  # refresh LRU position
+    except (FileNotFoundError, OSError, ValueError, KeyError):
+        with _lock:
+            _stats["misses"] += 1
+        return None
+
+    with _lock:
+        _stats["hits"] += 1
+    return summary
+
+def put(key, summary, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    # Write to a temp file and rename, so concurrent readers in other
+    # workers never see a partially written entry
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary}, f)
+        os.replace(tmp_path, os.path.join(cache_dir, f"{key}.json"))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    _evict(cache_dir, max_bytes)
+
+def _evict(cache_dir, max_bytes):
+    # Least recently used first; hits refresh a file's mtime. Entries may be
+    # removed by another worker between listdir and stat/remove
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(".json"):
+            path = os.path.join(cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            with _lock:
+                _stats["evictions"] += 1
+        except FileNotFoundError:
+            pass
+        total -= size
@@ -5,6 +5,16 @@ import docx
 
 ALLOWED_EXTENSIONS = {"txt", "csv", "docx"}
 
+def text_column(df):
+    """
+    Picks the review column of a CSV: 'Text' if present, else the first
+    string column. Returns None if there is no string column.
+    """
+    if "Text" in df.columns:
+        return "Text"
+    string_cols = [col for col in df.columns if df[col].dtype == object or pd.api.types.is_string_dtype(df[col])]
+    return string_cols[0] if string_cols else None
+
 def read_file(uploaded_file):
     """
     Reads an uploaded file and extracts text content.
@@ -40,14 +50,10 @@ def read_file(uploaded_file):
             if df.empty:
                 raise ValueError("CSV file is empty.")
 
-            # Prefer 'Text' column
-            if "Text" in df.columns:
-                return "\n\n".join(df["Text"].dropna().astype(str).tolist())
-            
-            # Else first string column
-            string_cols = [col for col in df.columns if df[col].dtype == object]
-            if string_cols:
-                return "\n\n".join(df[string_cols[0]].dropna().astype(str).tolist())
+            # Prefer 'Text' column, else first string column
+            column = text_column(df)
+            if column is not None:
+                return "\n\n".join(df[column].dropna().astype(str).tolist())
 
             # Fallback: return entire dataframe
             return df.to_string()
@@ -65,6 +71,31 @@ def read_file(uploaded_file):
 
     raise ValueError("Unexpected error in file processing.")
 
+def read_rows(uploaded_file):
+    """
+    Reads an uploaded CSV and keeps its rows separate, for per-row analysis.
+    Returns a Series of non-empty review texts indexed by CSV row number.
+    """
+    if uploaded_file is None:
+        raise ValueError("No file uploaded.")
+    if uploaded_file.name.lower().split('.')[-1] != "csv":
+        raise ValueError("Per-row analysis needs a CSV file.")
+
+    try:
+        df = pd.read_csv(io.BytesIO(uploaded_file.read()))
+    except Exception as e:
+        raise ValueError(f"Error reading CSV file: {str(e)}")
+
+    column = text_column(df)
+    if column is None:
+        raise ValueError("CSV file has no text column.")
+
+    rows = df[column].dropna().astype(str)
+    rows = rows[rows.str.strip() != ""]
+    if rows.empty:
+        raise ValueError("CSV file has no non-empty rows.")
+    return rows.rename("text")
+
 def basic_checks(text, min_chars = 50, min_words = 10):
     """
     Performs basic validation checks on extracted text.
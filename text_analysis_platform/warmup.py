@@ -0,0 +1,77 @@
+import importlib
+import threading
+import time
+
+# Seconds spent importing each module through timed_import, in this process
+IMPORT_TIMES = {}
+
+def timed_import(name):
+    """
+    Imports a module and records how long the first import took.
+    Later calls are dictionary lookups and are not recorded again.
+    """
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMES.setdefault(name, time.perf_counter() - start)
+    return module
+
+class Warmup:
+    """
+    Runs named loader functions once, in order, on a background thread.
+    get(name) blocks until that loader has finished and returns its result
+    (or re-raises its error), so callers can use a model the moment it is
+    ready without waiting for the rest.
+    """
+
+    def __init__(self, tasks, imports=()):
+        self.tasks = dict(tasks)
+        self.imports = list(imports)
+        self.results = {}
+        self.errors = {}
+        self.seconds = {}
+        self._done = {name: threading.Event() for name in self.tasks}
+        self._thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        # Pay for the heavy imports first; the loaders below then find
+        # them in sys.modules
+        for name in self.imports:
+            try:
+                timed_import(name)
+            except ImportError:
+                pass
+
+        for name, load in self.tasks.items():
+            start = time.perf_counter()
+            try:
+                self.results[name] = load()
+            except Exception as e:
+                self.errors[name] = e
+            self.seconds[name] = time.perf_counter() - start
+            self._done[name].set()
+
+    def status(self):
+        """
+        'ready', 'failed' or 'loading' for each task.
+        """
+        status = {}
+        for name, done in self._done.items():
+            if not done.is_set():
+                status[name] = "loading"
+            else:
+                status[name] = "failed" if name in self.errors else "ready"
+        return status
+
+    def is_ready(self):
+        return all(done.is_set() for done in self._done.values())
+
+    def get(self, name, timeout=None):
+        if not self._done[name].wait(timeout):
+            raise TimeoutError(f"{name} is still loading")
+        if name in self.errors:
+            raise self.errors[name]
+        return self.results[name]